@@ -3,8 +3,11 @@ import os
 import sys
 import json
 from datetime import datetime
+from paste_index import DirectoryIndex
+from assets import register_assets
 
 app = Flask(__name__)
+register_assets(app)
 
 DATA = os.path.join(os.getcwd(), "data")
 ADMIN_PASTES = os.path.join(os.getcwd(), "data", "admin")
@@ -13,8 +16,10 @@ ANON_PASTES = os.path.join(os.getcwd(), "data", "other")
 with open(os.path.join(DATA, "template"), "r", encoding="utf-8") as temp_file:
     _DEFAULT_POST_TEMPLATE = temp_file.read()
 
-admin_posts_list = []
-anon_posts_list = []
+INDEX_PAGE_SIZE = 100
+
+admin_posts_index = DirectoryIndex(ADMIN_PASTES)
+anon_posts_index = DirectoryIndex(ANON_PASTES)
 loosers_list = []
 
 
@@ -30,53 +35,19 @@ def refreshLoosers():
                 loosers_list.append(looser)
 
 
-def refreshAdminPosts():
-    global admin_posts_list
-    admin_posts_file_list = os.listdir(ADMIN_PASTES)
-    if not(len(admin_posts_list) == len(admin_posts_file_list)):
-        for admin_post_file_name in admin_posts_file_list:
-            admin_post_file_name_path = os.path.join(
-                ADMIN_PASTES, admin_post_file_name)
-            admin_post_file_name_stats = os.stat(admin_post_file_name_path)
-            admin_posts_list.append(
-                {
-                    "name": admin_post_file_name,
-                    "size": bytes2KB(admin_post_file_name_stats.st_size),
-                    "creation_date": datetime.utcfromtimestamp(int(admin_post_file_name_stats.st_mtime)).strftime('%d-%m-%Y'),
-                    "creation_time": datetime.utcfromtimestamp(int(admin_post_file_name_stats.st_mtime)).strftime('%H:%M:%S')
-                }
-            )
-
-
-def refreshAnonPosts():
-    global anon_posts_list
-    anon_posts_file_list = os.listdir(ANON_PASTES)
-    if not(len(anon_posts_list) == len(anon_posts_file_list)):
-        for anon_post_file_name in anon_posts_file_list:
-            anon_post_file_name_path = os.path.join(
-                ANON_PASTES, anon_post_file_name)
-            anon_post_file_name_stats = os.stat(anon_post_file_name_path)
-            anon_posts_list.append(
-                {
-                    "name": anon_post_file_name,
-                    "size": bytes2KB(anon_post_file_name_stats.st_size),
-                    "creation_date": datetime.utcfromtimestamp(int(anon_post_file_name_stats.st_mtime)).strftime('%d-%m-%Y'),
-                    "creation_time": datetime.utcfromtimestamp(int(anon_post_file_name_stats.st_mtime)).strftime('%H:%M:%S')
-                }
-            )
-
-
 def bytes2KB(value):
     return value / 1000
 
 
 @app.route("/")
 def index():
-    global admin_posts_list, anon_posts_list
+    page = max(request.args.get('page', 0, type=int), 0)
 
-    refreshAdminPosts()
-    refreshAnonPosts()
+    admin_posts_index.refresh()
+    anon_posts_index.refresh()
 
+    admin_posts_list = admin_posts_index.page(0, INDEX_PAGE_SIZE)
+    anon_posts_list = anon_posts_index.page(page * INDEX_PAGE_SIZE, INDEX_PAGE_SIZE)
     return render_template("index.html", admin_posts_list=admin_posts_list, anon_posts_list=anon_posts_list)
 
 
@@ -2,79 +2,170 @@
 skids.rest - Enhanced Flask Application
 Full-featured pastebin with user management, chat, support system, and premium subscriptions
 """
-from flask import Flask, render_template, request, url_for, redirect, jsonify, session, flash
+from flask import Flask, render_template, request, url_for, redirect, jsonify, session, flash, make_response, g, send_from_directory
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_cors import CORS
-from flask_mail import Mail, Message
 from dotenv import load_dotenv
 import os
 import sys
 import json
-import stripe
-from datetime import datetime, timedelta
+import time
+import hashlib
+import hmac
+import threading
+from functools import wraps
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import desc, and_, or_
+from sqlalchemy.orm import defer
 from sqlalchemy.exc import IntegrityError
 
 # Import models and database
 from models import User, Paste, Comment, SupportTicket, ChatMessage, SecurityLog
-from database import db_session, init_db, engine
+from database import db_session, init_db, DATABASE_REPLICA_URLS, READ_AFTER_WRITE_WINDOW
+from static_data import StaticDataFile, parse_hol, parse_text
+from cache import ByteLRU
+from assets import register_assets
+from paste_upload import PasteTooLarge, paste_size_limit, max_request_size, read_paste_upload
+from revisions import add_revision, revision_content, list_revisions
+from ids import is_uuid, new_id, short_id_for
+from tickets import TICKET_STATUSES, TICKET_PRIORITIES, ticket_queue, ticket_notes, add_note
+from scheduler import Scheduler, SCHEDULER_ENABLED
+from profiles import profile_view, paste_page, comment_page, invalidate_profile, PROFILE_PAGE_MAX
+from spam_filter import PASTE_FINGERPRINTS, fingerprint, screen_paste, record_fingerprint
+from profiler import PROFILER, FORMATS, profile_format, find_frame
+from chat_history import CHAT_BUFFER, CHAT_PAGE_SIZE, CHAT_PAGE_MAX, history_page, missed_messages, message_dict, valid_room
+from backpressure import CHAT_THROTTLE, OUTBOUND_LIMITER, BACKPRESSURE_STATS
+from chat_broadcast import CHAT_BROADCASTER
+from chat_archive import CHAT_ARCHIVE
+from leaderboard import LEADERBOARD, LEADERBOARD_SIZE, LEADERBOARD_PAGE_MAX, change_reputation
+from metrics import METRICS, METRICS_TOKEN
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
+# Flask app; routes attach to it at import, create_app() configures it
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-this')
-app.config['SESSION_TYPE'] = 'filesystem'
-
-# Database
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_PRICE_ID = os.getenv('STRIPE_PRICE_ID')
 
 # Discord Webhook
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
 
-# Mail configuration
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True') == 'True'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-
-# Initialize extensions
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
+# Extensions, bound to the app by create_app()
+bcrypt = Bcrypt()
+login_manager = LoginManager()
 login_manager.login_view = 'login'
-socketio = SocketIO(app, cors_allowed_origins="*")
-mail = Mail(app)
-CORS(app, origins=os.getenv('ALLOWED_ORIGINS', '*').split(','))
+socketio = SocketIO()
+mail = None
 
 # Rate limiting
 limiter = Limiter(
-    app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
     storage_uri=os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
 )
 
+_app_ready = False
+_app_lock = threading.Lock()
+
+
+def create_app():
+    """
+    Configure the app and initialise its extensions (once per process).
+
+    Importing this module only defines routes; the config, extension
+    set-up and their heavier imports (eventlet via SocketIO, Flask-Mail,
+    CORS) happen here. Database engines and the Stripe client are created
+    on first use.
+    """
+    global mail, _app_ready
+    with _app_lock:
+        if _app_ready:
+            return app
+        
+        app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-this')
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config['MAX_CONTENT_LENGTH'] = max_request_size()
+        
+        # Database
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        
+        # Mail configuration
+        app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+        app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+        app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True') == 'True'
+        app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+        app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+        
+        from flask_cors import CORS
+        from flask_mail import Mail
+        
+        bcrypt.init_app(app)
+        login_manager.init_app(app)
+        # SOCKETIO_ASYNC_MODE follows the gunicorn worker class (see
+        # gunicorn.conf.py); a message queue lets several workers broadcast
+        socketio.init_app(
+            app,
+            cors_allowed_origins="*",
+            async_mode=os.getenv('SOCKETIO_ASYNC_MODE') or None,
+            message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+        )
+        OUTBOUND_LIMITER.install(socketio.server)
+        CHAT_BROADCASTER.init_app(socketio)
+        mail = Mail(app)
+        limiter.init_app(app)
+        CORS(app, origins=os.getenv('ALLOWED_ORIGINS', '*').split(','))
+        register_assets(app, limiter)
+        
+        _app_ready = True
+        return app
+
+
+_stripe = None
+
+
+def stripe_client():
+    """The stripe module with its API key set, imported on first use"""
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+        _stripe = stripe
+    return _stripe
+
+# Rendered paste pages, keyed by the paste's stored revision number
+PASTE_PAGE_CACHE = ByteLRU(int(os.getenv('PASTE_PAGE_CACHE_BYTES', 64 * 1024 * 1024)))
+
+# Batch paste API quotas per User.tier: pastes per request, requests per hour
+BATCH_PASTE_LIMITS = {
+    'free': (int(os.getenv('BATCH_PASTES_FREE', 50)), os.getenv('BATCH_RATE_FREE', '5 per hour')),
+    'premium': (int(os.getenv('BATCH_PASTES_PREMIUM', 500)), os.getenv('BATCH_RATE_PREMIUM', '60 per hour')),
+}
+
 # Legacy data paths (for migration)
 DATA = os.path.join(os.getcwd(), "data")
 ADMIN_PASTES = os.path.join(os.getcwd(), "data", "admin")
 ANON_PASTES = os.path.join(os.getcwd(), "data", "other")
 
+# Page data files, re-read only when they change on disk
+HOL_DATA = StaticDataFile(os.path.join(DATA, "hol.json"), parse_hol, default=[])
+TOS_DATA = StaticDataFile(os.path.join(DATA, "tos"), parse_text, default='')
+
+# Ban/suspension/premium expiry jobs, coordinated across workers by a DB lease
+scheduler = Scheduler()
+
 
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
+    if not is_uuid(user_id):
+        return None
     return db_session.query(User).filter_by(id=user_id).first()
 
 
@@ -110,18 +201,146 @@ def send_discord_notification(message):
         print(f"Error sending Discord notification: {e}")
 
 
+def serve_paste(paste, render_page):
+    """
+    Serve a paste page with a strong ETag and Last-Modified, answering
+    conditional requests with 304 before anything is rendered. Both come
+    from the paste row (Paste.revision, bumped by every edit), so all
+    workers agree on them; pages for anonymous visitors are cached by paste
+    id and revision.
+    """
+    revision = paste.revision or 1
+    etag = f"{paste.id}-r{revision}"
+    if current_user.is_authenticated:
+        # The navbar differs per user
+        etag += '-' + hashlib.sha256(str(current_user.id).encode()).hexdigest()[:8]
+    changed = paste.edited_at or paste.created_date
+    last_modified = changed.replace(tzinfo=timezone.utc) if changed else None
+    
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = bool(last_modified and request.if_modified_since
+                     and last_modified.replace(microsecond=0) <= request.if_modified_since)
+    
+    if fresh:
+        response = app.response_class(status=304)
+    else:
+        cache_key = (request.endpoint, paste.id, revision)
+        
+        # Increment view count (revalidations are not counted again)
+        paste.views += 1
+        db_session.commit()
+        
+        body = None if current_user.is_authenticated else PASTE_PAGE_CACHE.get(cache_key)
+        if body is None:
+            body = render_page().encode('utf-8')
+            if not current_user.is_authenticated:
+                PASTE_PAGE_CACHE.put(cache_key, body)
+        response = make_response(body)
+    
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
 # Context processor to inject user data into templates
 @app.context_processor
 def inject_user():
     return dict(current_user=current_user)
 
 
+def is_admin():
+    return current_user.is_authenticated and current_user.role in ['admin', 'manager']
+
+
+# Sampling profiler: one request (?_profile=1 or X-Profile, admins only) or
+# every request to an endpoint with an open window (/admin/profiler)
+@app.before_request
+def start_profiling():
+    fmt = profile_format(request.args.get('_profile') or request.headers.get('X-Profile'))
+    if not fmt and not PROFILER.watching(request.endpoint):
+        return
+    if fmt and not is_admin():
+        fmt = None
+    g.profile = PROFILER.begin(request.endpoint, find_frame(Flask.full_dispatch_request.__code__), fmt)
+
+
+@app.after_request
+def finish_profiling(response):
+    name = PROFILER.end(g.pop('profile', None))
+    if name:
+        response.headers['X-Profile-File'] = name
+    return response
+
+
+@app.teardown_request
+def abandon_profiling(exception=None):
+    PROFILER.end(g.pop('profile', None))
+
+
+# Request metrics for /metrics, by endpoint
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = METRICS.begin_request(request.endpoint)
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        METRICS.end_request(request.endpoint, request.method, response.status_code, started)
+    return response
+
+
+@app.teardown_request
+def abandon_request_metrics(exception=None):
+    # No response came back
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        METRICS.end_request(request.endpoint, request.method, 500, started)
+
+
+# Keep a user's reads on the primary for a short window after their own writes
+@app.before_request
+def pin_recent_writer_to_primary():
+    if DATABASE_REPLICA_URLS and session.get('db_primary_until', 0) > time.time():
+        db_session.info['use_primary'] = True
+
+
+@app.after_request
+def remember_recent_write(response):
+    if DATABASE_REPLICA_URLS and db_session.registry.has() and db_session.info.get('wrote'):
+        session['db_primary_until'] = time.time() + READ_AFTER_WRITE_WINDOW
+    return response
+
+
+# Start background jobs in each worker once it is serving (never before a fork)
+@app.before_request
+def start_scheduler():
+    if SCHEDULER_ENABLED:
+        scheduler.start(socketio.start_background_task, socketio.sleep)
+    METRICS.start(socketio.start_background_task, socketio.sleep)
+
+
 # Teardown function to close database session
 @app.teardown_appcontext
 def shutdown_session(exception=None):
     db_session.remove()
 
 
+def read_only(f):
+    """Decorator allowing a route's queries to be served by a read replica"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        db_session.info['read_only'] = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
@@ -166,6 +385,7 @@ def register():
         try:
             db_session.add(new_user)
             db_session.commit()
+            LEADERBOARD.add(username)
             log_security_event('register', success=True, user_id=username)
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
@@ -232,6 +452,7 @@ def logout():
 # ============================================================================
 
 @app.route("/")
+@read_only
 def index():
     """Homepage with paste listings"""
     # Get pinned pastes (admin posts)
@@ -252,6 +473,7 @@ def index():
     for paste in admin_posts:
         admin_posts_list.append({
             'id': str(paste.id),
+            'short_id': paste.short_id,
             'name': paste.title,
             'creation_date': paste.created_date.strftime('%d-%m-%Y') if paste.created_date else '',
             'creation_time': paste.created_date.strftime('%H:%M:%S') if paste.created_date else '',
@@ -262,6 +484,7 @@ def index():
     for paste in anon_posts:
         anon_posts_list.append({
             'id': str(paste.id),
+            'short_id': paste.short_id,
             'name': paste.title,
             'creation_date': paste.created_date.strftime('%d-%m-%Y') if paste.created_date else '',
             'creation_time': paste.created_date.strftime('%H:%M:%S') if paste.created_date else '',
@@ -279,7 +502,10 @@ def index():
 def post(file):
     """View anonymous paste (compatibility route)"""
     # Try to find paste by title (for backward compatibility)
-    paste = db_session.query(Paste).filter_by(title=file, is_deleted=False).first()
+    paste = db_session.query(Paste).options(defer(Paste.content)).filter_by(
+        title=file,
+        is_deleted=False
+    ).first()
     
     if not paste:
         flash('Paste not found', 'error')
@@ -290,25 +516,21 @@ def post(file):
         flash('This paste has expired', 'error')
         return redirect(url_for('index'))
     
-    # Increment view count
-    paste.views += 1
-    db_session.commit()
-    
-    return render_template(
+    return serve_paste(paste, lambda: render_template(
         'post.html',
         filename=paste.title,
         file_content=paste.content,
         creation_date=paste.created_date.strftime('%d-%m-%Y') if paste.created_date else '',
         creation_time=paste.created_date.strftime('%H:%M:%S') if paste.created_date else '',
         size=round(len(paste.content) / 1000, 2) if paste.content else 0
-    )
+    ))
 
 
 @app.route("/admin/<file>")
 def admin_post(file):
     """View admin/pinned paste (compatibility route)"""
     # Try to find pinned paste by title
-    paste = db_session.query(Paste).filter_by(
+    paste = db_session.query(Paste).options(defer(Paste.content)).filter_by(
         title=file,
         is_pinned=True,
         is_deleted=False
@@ -318,18 +540,14 @@ def admin_post(file):
         flash('Paste not found', 'error')
         return redirect(url_for('index'))
     
-    # Increment view count
-    paste.views += 1
-    db_session.commit()
-    
-    return render_template(
+    return serve_paste(paste, lambda: render_template(
         'admin.html',
         filename=paste.title,
         file_content=paste.content,
         creation_date=paste.created_date.strftime('%d-%m-%Y') if paste.created_date else '',
         creation_time=paste.created_date.strftime('%H:%M:%S') if paste.created_date else '',
         size=round(len(paste.content) / 1000, 2) if paste.content else 0
-    )
+    ))
 
 
 @app.route("/new")
@@ -343,34 +561,62 @@ def new_paste():
 @limiter.limit("20 per hour")
 def new_paste_form_post():
     """Create new paste (form submission)"""
+    limit = paste_size_limit(current_user)
     try:
-        title = request.form.get('pasteTitle', 'Untitled').strip()
-        content = request.form.get('pasteContent', '').strip()
+        upload = read_paste_upload(request, limit)
+    except PasteTooLarge:
+        flash(f'Paste is too large (limit {limit // 1024} KB for your account)', 'error')
+        return redirect(url_for('new_paste'))
+    
+    try:
+        title = upload.get('pasteTitle', 'Untitled').strip()
         
-        if not content:
+        if not upload.content.size:
             flash('Paste content cannot be empty', 'error')
             return redirect(url_for('new_paste'))
         
+        content = upload.content.read_text()
+        author = current_user.username if current_user.is_authenticated else 'anonymous'
+        
+        # Screen for reposts and floods before anything is written
+        entry = fingerprint(new_id(), content, author, digest=upload.content.digest)
+        if not (current_user.is_authenticated and current_user.role in ['admin', 'manager', 'mod']):
+            verdict, existing_id = screen_paste(db_session, entry)
+            if verdict == 'duplicate':
+                existing = db_session.query(Paste).options(defer(Paste.content)).filter_by(id=existing_id).first()
+                if existing and not existing.is_deleted:
+                    flash('You already posted this paste', 'info')
+                    return redirect(url_for('view_paste', paste_id=existing.short_id or existing.id))
+            elif verdict == 'spam':
+                flash('Too many similar pastes were posted recently, please try again later', 'error')
+                return redirect(url_for('new_paste'))
+        
         # Replace forward slashes in title to avoid path issues
         title = title.replace("/", "%2F")
         
         # Create paste
         paste = Paste(
+            id=entry.paste_id,
             title=title,
             content=content,
             language='text',  # Default language
             is_public=True,   # Default to public
             expires_at=None,  # Never expires by default
-            created_by=current_user.username if current_user.is_authenticated else 'anonymous'
+            created_by=author,
+            created_date=entry.created_at
         )
         
         db_session.add(paste)
+        record_fingerprint(db_session, entry)
         
         # Update user paste count
         if current_user.is_authenticated:
             current_user.paste_count += 1
         
         db_session.commit()
+        PASTE_FINGERPRINTS.add(entry)
+        if current_user.is_authenticated:
+            invalidate_profile(current_user.username)
         
         log_security_event(
             'paste_create',
@@ -386,65 +632,179 @@ def new_paste_form_post():
         db_session.rollback()
         flash(f'Error creating paste: {str(e)}', 'error')
         return redirect(url_for('new_paste'))
+    
+    finally:
+        upload.close()
 
 
-@app.route("/paste/<paste_id>")
-def view_paste(paste_id):
-    """View a paste"""
-    paste = db_session.query(Paste).filter_by(id=paste_id).first()
+def find_visible_paste(paste_id):
+    """Load a paste by short id or UUID (content deferred) if the current user may see it, else flash why"""
+    query = db_session.query(Paste).options(defer(Paste.content))
+    if is_uuid(paste_id):
+        paste = query.filter_by(id=paste_id).first()
+    else:
+        paste = query.filter_by(short_id=paste_id).first()
     
     if not paste or paste.is_deleted:
         flash('Paste not found', 'error')
-        return redirect(url_for('index'))
+        return None
     
     # Check if expired
     if paste.expires_at and paste.expires_at < datetime.utcnow():
         flash('This paste has expired', 'error')
-        return redirect(url_for('index'))
+        return None
     
     # Check visibility
     if not paste.is_public and (not current_user.is_authenticated or current_user.username != paste.created_by):
         flash('This paste is private', 'error')
+        return None
+    
+    return paste
+
+
+def can_edit_paste(paste):
+    """Owners and admins can edit; anonymous pastes have no owner"""
+    if not current_user.is_authenticated:
+        return False
+    return current_user.username == paste.created_by or current_user.role in ['admin', 'manager']
+
+
+@app.route("/paste/<paste_id>")
+def view_paste(paste_id):
+    """View a paste"""
+    paste = find_visible_paste(paste_id)
+    if not paste:
         return redirect(url_for('index'))
     
-    # Increment view count
-    paste.views += 1
-    db_session.commit()
+    # Old UUID links redirect to the short URL
+    if paste.short_id and paste_id != paste.short_id:
+        return redirect(url_for('view_paste', paste_id=paste.short_id), code=301)
+    
+    return serve_paste(paste, lambda: render_template('view_paste.html', paste=paste))
+
+
+@app.route("/paste/<paste_id>/edit", methods=['GET', 'POST'])
+@login_required
+def edit_paste(paste_id):
+    """Edit a paste, recording the previous content as a revision"""
+    paste = find_visible_paste(paste_id)
+    if not paste:
+        return redirect(url_for('index'))
+    
+    if not can_edit_paste(paste):
+        flash('You can only edit your own pastes', 'error')
+        return redirect(url_for('view_paste', paste_id=paste_id))
+    
+    paste_id = paste.short_id or paste.id
+    if request.method == 'POST':
+        limit = paste_size_limit(current_user)
+        try:
+            upload = read_paste_upload(request, limit)
+        except PasteTooLarge:
+            flash(f'Paste is too large (limit {limit // 1024} KB for your account)', 'error')
+            return redirect(url_for('edit_paste', paste_id=paste_id))
+        
+        try:
+            if not upload.content.size:
+                flash('Paste content cannot be empty', 'error')
+                return redirect(url_for('edit_paste', paste_id=paste_id))
+            
+            content = upload.content.read_text()
+            if content == paste.content:
+                flash('No changes to save', 'info')
+                return redirect(url_for('view_paste', paste_id=paste_id))
+            
+            number = add_revision(db_session, paste, content, current_user.username)
+            entry = fingerprint(
+                paste.id, content, paste.created_by,
+                digest=upload.content.digest, created_at=paste.created_date
+            )
+            record_fingerprint(db_session, entry, replace=True)
+            db_session.commit()
+        except IntegrityError:
+            db_session.rollback()
+            flash('This paste was edited at the same time, please try again', 'error')
+            return redirect(url_for('edit_paste', paste_id=paste_id))
+        finally:
+            upload.close()
+        
+        PASTE_FINGERPRINTS.add(entry)
+        log_security_event(
+            'paste_edit',
+            success=True,
+            user_id=current_user.username,
+            additional_data={'paste_id': paste.id, 'revision': number}
+        )
+        
+        flash(f'Paste updated (revision {number})', 'success')
+        return redirect(url_for('view_paste', paste_id=paste_id))
     
-    return render_template('view_paste.html', paste=paste)
+    return render_template(
+        'edit_paste.html',
+        paste=paste,
+        revisions=list_revisions(db_session, paste.id)
+    )
+
+
+@app.route("/paste/<paste_id>/rev/<int:number>")
+def view_paste_revision(paste_id, number):
+    """View an older revision of a paste"""
+    paste = find_visible_paste(paste_id)
+    if not paste:
+        return redirect(url_for('index'))
+    
+    # Revisions never change once written
+    paste_id = paste.short_id or paste.id
+    etag = f"{paste.id}-r{number}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        content = revision_content(db_session, paste, number)
+        if content is None:
+            flash('Revision not found', 'error')
+            return redirect(url_for('view_paste', paste_id=paste_id))
+        
+        response = make_response(render_template(
+            'post.html',
+            filename=f"{paste.title} (revision {number})",
+            file_content=content,
+            creation_date=paste.created_date.strftime('%d-%m-%Y') if paste.created_date else '',
+            creation_time=paste.created_date.strftime('%H:%M:%S') if paste.created_date else '',
+            size=round(len(content) / 1000, 2)
+        ))
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 # ============================================================================
 # USER PROFILE ROUTES
 # ============================================================================
 
+@app.route("/leaderboard")
+@read_only
+def leaderboard():
+    """Users with the most reputation"""
+    users, total = LEADERBOARD.top(db_session, LEADERBOARD_SIZE)
+    mine = None
+    if current_user.is_authenticated:
+        mine = LEADERBOARD.rank(db_session, current_user.username)
+    
+    return render_template('leaderboard.html', users=users, total=total, mine=mine)
+
+
 @app.route("/user/<username>")
+@read_only
 def user_profile(username):
     """View user profile"""
-    user = db_session.query(User).filter_by(username=username).first()
+    profile = profile_view(db_session, username)
     
-    if not user:
+    if not profile:
         flash('User not found', 'error')
         return redirect(url_for('index'))
     
-    # Get user's public pastes
-    user_pastes = db_session.query(Paste).filter_by(
-        created_by=username,
-        is_public=True,
-        is_deleted=False
-    ).order_by(desc(Paste.created_date)).limit(10).all()
-    
-    # Get profile comments
-    comments = db_session.query(Comment).filter_by(
-        profile_user=username
-    ).order_by(desc(Comment.created_at)).limit(20).all()
-    
-    return render_template(
-        'user_profile.html',
-        user=user,
-        user_pastes=user_pastes,
-        comments=comments
-    )
+    return render_template('user_profile.html', **profile)
 
 
 @app.route("/user/<username>/comment", methods=['POST'])
@@ -470,6 +830,7 @@ def post_comment(username):
     current_user.comment_count += 1
     
     db_session.commit()
+    invalidate_profile(username, current_user.username)
     
     flash('Comment posted!', 'success')
     return redirect(url_for('user_profile', username=username))
@@ -479,31 +840,88 @@ def post_comment(username):
 # CHAT ROUTES (WebSocket)
 # ============================================================================
 
+# Handler names a profiling window can target
+PROFILED_EVENTS = set()
+
+
+def profiled_event(f):
+    """Let the profiler sample a Socket.IO handler ("_profile" in the event data, or a window on its name)"""
+    target = f.__name__
+    PROFILED_EVENTS.add(target)
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        data = args[0] if args else None
+        fmt = profile_format(data.get('_profile') if isinstance(data, dict) else None)
+        if not fmt and not PROFILER.watching(target):
+            return f(*args, **kwargs)
+        if fmt and not is_admin():
+            fmt = None
+        token = PROFILER.begin(target, sys._getframe(), fmt)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            name = PROFILER.end(token)
+            if name:
+                emit('profile_written', {'file': name})
+    return decorated_function
+
+
+def metered_event(f):
+    """Count and time a Socket.IO handler for /metrics, under its event name"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        started = time.perf_counter()
+        error = True
+        try:
+            result = f(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            METRICS.observe_event(request.event['message'], time.perf_counter() - started, error)
+    return decorated_function
+
+
 @socketio.on('connect')
-def handle_connect():
+@metered_event
+@profiled_event
+def handle_connect(auth=None):
     """Handle WebSocket connection"""
     if current_user.is_authenticated:
         emit('user_connected', {'username': current_user.username}, broadcast=True)
 
 
 @socketio.on('disconnect')
+@metered_event
+@profiled_event
 def handle_disconnect():
     """Handle WebSocket disconnection"""
+    CHAT_THROTTLE.forget(request.sid)
     if current_user.is_authenticated:
         emit('user_disconnected', {'username': current_user.username}, broadcast=True)
 
 
 @socketio.on('send_message')
+@metered_event
+@profiled_event
 def handle_message(data):
-    """Handle chat message"""
+    """Handle chat message: {message, room} -> {id} once it is saved and broadcast"""
     if not current_user.is_authenticated:
-        return
+        return {'error': 'Login required'}
     
     content = data.get('message', '').strip()
     room = data.get('room', 'global')
     
     if not content:
-        return
+        return {'error': 'Message cannot be empty'}
+    if not valid_room(room):
+        return {'error': 'Invalid room'}
+    
+    # Socket.IO events get past Flask-Limiter, so chat has its own buckets
+    wait = CHAT_THROTTLE.allow(request.sid, current_user.username)
+    if wait:
+        emit('throttled', {'retry_after': round(wait, 1)})
+        return {'error': 'Throttled', 'retry_after': round(wait, 1)}
     
     # Save message to database
     message = ChatMessage(
@@ -517,27 +935,62 @@ def handle_message(data):
     db_session.commit()
     
     # Broadcast message
-    emit('new_message', {
-        'id': str(message.id),
-        'username': current_user.username,
-        'content': content,
-        'timestamp': message.created_at.isoformat(),
-        'user_color': current_user.username_color
-    }, broadcast=True)
+    payload = message_dict(message, current_user.username_color)
+    CHAT_BUFFER.append(room, payload)
+    CHAT_BROADCASTER.publish(room, payload)
+    return {'id': payload['id']}
+
+
+@socketio.on('history')
+@metered_event
+@profiled_event
+def handle_history(data):
+    """Older chat messages for infinite scroll: {room, before, limit} -> {messages, next}"""
+    if not current_user.is_authenticated:
+        return {'error': 'Login required'}
+    
+    data = data if isinstance(data, dict) else {}
+    room = data.get('room', 'global')
+    if not valid_room(room):
+        return {'error': 'Invalid room'}
+    try:
+        limit = min(max(int(data.get('limit', CHAT_PAGE_SIZE)), 1), CHAT_PAGE_MAX)
+        messages, next_cursor = history_page(db_session, room, data.get('before'), limit)
+    except (TypeError, ValueError):
+        return {'error': 'Invalid cursor'}
+    
+    return {'messages': messages, 'next': next_cursor}
+
+
+@socketio.on('sync')
+@metered_event
+@profiled_event
+def handle_sync(data):
+    """Chat messages missed while disconnected: {room, last_id} -> {messages, complete}"""
+    if not current_user.is_authenticated:
+        return {'error': 'Login required'}
+    
+    data = data if isinstance(data, dict) else {}
+    room = data.get('room', 'global')
+    if not valid_room(room):
+        return {'error': 'Invalid room'}
+    last_id = data.get('last_id')
+    if not isinstance(last_id, str) or not is_uuid(last_id):
+        return {'messages': [], 'complete': False}
+    
+    messages, complete = missed_messages(db_session, room, last_id)
+    return {'messages': messages, 'complete': complete}
 
 
 @app.route("/chat")
 @login_required
+@read_only
 def chat():
     """Chat page"""
-    # Get recent messages
-    messages = db_session.query(ChatMessage).filter_by(
-        room='global'
-    ).order_by(desc(ChatMessage.created_at)).limit(100).all()
-    
-    messages.reverse()  # Show oldest first
+    # Latest page; older ones are fetched over the socket as the user scrolls up
+    messages, before = history_page(db_session, 'global')
     
-    return render_template('chat.html', messages=messages)
+    return render_template('chat.html', messages=messages, before=before)
 
 
 # ============================================================================
@@ -610,7 +1063,7 @@ def upgrade():
 def create_checkout_session():
     """Create Stripe checkout session"""
     try:
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = stripe_client().checkout.Session.create(
             customer_email=current_user.email,
             payment_method_types=['card'],
             line_items=[{
@@ -642,6 +1095,7 @@ def payment_success():
         current_user.tier_status = 'active'
         current_user.premium_expires_at = datetime.utcnow() + timedelta(days=30)
         db_session.commit()
+        invalidate_profile(current_user.username)
         
         flash('Welcome to Premium! 🎉', 'success')
     
@@ -654,7 +1108,6 @@ def payment_success():
 
 def admin_required(f):
     """Decorator to require admin role"""
-    from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated or current_user.role not in ['admin', 'manager']:
@@ -716,6 +1169,8 @@ def ban_user():
         user.banned_until = None if permanent else datetime.utcnow() + timedelta(days=30)
         
         db_session.commit()
+        invalidate_profile(username)
+        LEADERBOARD.discard(username)
         
         log_security_event(
             'admin_action',
@@ -729,16 +1184,228 @@ def ban_user():
     return redirect(url_for('admin_users'))
 
 
+@app.route("/admin/reputation", methods=['POST'])
+@login_required
+@admin_required
+def adjust_reputation():
+    """Award or take away reputation points"""
+    username = request.form.get('username')
+    delta = request.form.get('points', 0, type=int)
+    
+    points = change_reputation(db_session, username, delta)
+    if points is None:
+        flash('User not found', 'error')
+        return redirect(url_for('admin_users'))
+    
+    db_session.commit()
+    LEADERBOARD.move(username, points)
+    invalidate_profile(username)
+    
+    log_security_event(
+        'admin_action',
+        success=True,
+        user_id=current_user.username,
+        additional_data={'action': 'adjust_reputation', 'target': username, 'points': delta}
+    )
+    
+    flash(f'{username} now has {points} reputation', 'success')
+    return redirect(url_for('admin_users'))
+
+
+@app.route("/metrics")
+@limiter.exempt
+def metrics():
+    """Prometheus metrics for every worker (bearer METRICS_TOKEN, or an admin session)"""
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        allowed = hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {METRICS_TOKEN}'.encode('utf-8'))
+    else:
+        allowed = is_admin()
+    if not allowed:
+        return 'Forbidden\n', 403
+    
+    response = make_response(METRICS.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+
+@app.route("/admin/chat/backpressure")
+@login_required
+@admin_required
+def chat_backpressure():
+    """Throttled and dropped chat traffic in this worker"""
+    return jsonify({
+        'stats': dict(BACKPRESSURE_STATS),
+        'buckets': len(CHAT_THROTTLE),
+        'send_queues': OUTBOUND_LIMITER.queue_depths(),
+        'send_queue_max': OUTBOUND_LIMITER.limit,
+        'slow_client_policy': OUTBOUND_LIMITER.policy,
+        'broadcast': dict(CHAT_BROADCASTER.stats, coalesce_ms=CHAT_BROADCASTER.window * 1000)
+    })
+
+
+@app.route("/admin/chat/archive")
+@login_required
+@admin_required
+def chat_archive():
+    """Archived chat messages, newest first (?room=, ?user=, ?before= cursor, ?limit=)"""
+    room = request.args.get('room', 'global')
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+        messages, next_cursor = CHAT_ARCHIVE.page(
+            room, request.args.get('before'), limit, request.args.get('user') or None
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    
+    return jsonify({'room': room, 'messages': messages, 'next': next_cursor})
+
+
+@app.route("/admin/profiler", methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_profiler():
+    """Open a profiling window for an endpoint or Socket.IO handler; list windows and output files"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        target = (data.get('target') or '').strip()
+        fmt = data.get('format') or 'collapsed'
+        try:
+            seconds = int(data.get('seconds') or 60)
+        except (TypeError, ValueError):
+            seconds = None
+        if not target or fmt not in FORMATS or seconds is None:
+            return jsonify({'error': 'target, seconds and a format of collapsed or speedscope are required'}), 400
+        if target not in app.view_functions and target not in PROFILED_EVENTS:
+            return jsonify({'error': f'{target} is not an endpoint or Socket.IO handler'}), 400
+        
+        PROFILER.start_window(target, seconds, fmt)
+        log_security_event(
+            'admin_action',
+            success=True,
+            user_id=current_user.username,
+            additional_data={'action': 'profile', 'target': target, 'seconds': seconds}
+        )
+    
+    return jsonify({'windows': PROFILER.windows(), 'files': PROFILER.files()})
+
+
+@app.route("/admin/profiler/<target>", methods=['DELETE'])
+@login_required
+@admin_required
+def stop_profiler(target):
+    """Close a profiling window early"""
+    return jsonify({'files': PROFILER.stop_window(target)})
+
+
+@app.route("/admin/profiler/files/<name>")
+@login_required
+@admin_required
+def profiler_file(name):
+    """Download a profile"""
+    return send_from_directory(os.path.abspath(PROFILER.directory), name, as_attachment=True)
+
+
 @app.route("/admin/tickets")
 @login_required
 @admin_required
 def admin_tickets():
-    """Admin ticket management"""
-    tickets = db_session.query(SupportTicket).order_by(
-        desc(SupportTicket.created_at)
-    ).all()
+    """Staff ticket queue, filtered and paged oldest first"""
+    status = request.args.get('status', 'open')
+    priority = request.args.get('priority') or None
+    assigned_to = request.args.get('assigned_to') or None
+    
+    if status not in TICKET_STATUSES and status != 'all':
+        status = 'open'
+    if priority not in TICKET_PRIORITIES:
+        priority = None
+    
+    try:
+        tickets, next_cursor = ticket_queue(
+            db_session,
+            status=None if status == 'all' else status,
+            priority=priority,
+            assigned_to=assigned_to,
+            after=request.args.get('after') or None
+        )
+    except ValueError:
+        flash('Invalid page cursor', 'error')
+        return redirect(url_for('admin_tickets', status=status))
     
-    return render_template('admin_tickets.html', tickets=tickets)
+    return render_template(
+        'admin_tickets.html',
+        tickets=tickets,
+        next_cursor=next_cursor,
+        status=status,
+        priority=priority,
+        assigned_to=assigned_to,
+        statuses=TICKET_STATUSES,
+        priorities=TICKET_PRIORITIES
+    )
+
+
+def find_ticket(ticket_id):
+    """Load a ticket or flash that it does not exist"""
+    ticket = db_session.query(SupportTicket).filter_by(id=ticket_id).first() if is_uuid(ticket_id) else None
+    if not ticket:
+        flash('Ticket not found', 'error')
+    return ticket
+
+
+@app.route("/admin/tickets/<ticket_id>", methods=['GET', 'POST'])
+@login_required
+@admin_required
+def admin_ticket(ticket_id):
+    """View a ticket with its notes; POST updates status, priority or assignee"""
+    ticket = find_ticket(ticket_id)
+    if not ticket:
+        return redirect(url_for('admin_tickets'))
+    
+    if request.method == 'POST':
+        status = request.form.get('status', ticket.status)
+        priority = request.form.get('priority', ticket.priority)
+        if status not in TICKET_STATUSES or priority not in TICKET_PRIORITIES:
+            flash('Invalid status or priority', 'error')
+            return redirect(url_for('admin_ticket', ticket_id=ticket_id))
+        
+        ticket.status = status
+        ticket.priority = priority
+        ticket.assigned_to = request.form.get('assigned_to', ticket.assigned_to or '').strip()[:50] or None
+        db_session.commit()
+        
+        log_security_event(
+            'admin_action',
+            success=True,
+            user_id=current_user.username,
+            additional_data={'action': 'update_ticket', 'ticket_id': ticket_id, 'status': status,
+                             'priority': priority, 'assigned_to': ticket.assigned_to}
+        )
+        
+        flash('Ticket updated', 'success')
+        return redirect(url_for('admin_ticket', ticket_id=ticket_id))
+    
+    return render_template('admin_ticket.html', ticket=ticket, notes=ticket_notes(db_session, ticket.id))
+
+
+@app.route("/admin/tickets/<ticket_id>/notes", methods=['POST'])
+@login_required
+@admin_required
+def add_ticket_note(ticket_id):
+    """Append a staff note to a ticket"""
+    ticket = find_ticket(ticket_id)
+    if not ticket:
+        return redirect(url_for('admin_tickets'))
+    
+    content = request.form.get('content', '').strip()
+    if not content:
+        flash('Note cannot be empty', 'error')
+        return redirect(url_for('admin_ticket', ticket_id=ticket_id))
+    
+    add_note(db_session, ticket, current_user.username, content)
+    db_session.commit()
+    
+    flash('Note added', 'success')
+    return redirect(url_for('admin_ticket', ticket_id=ticket_id))
 
 
 # ============================================================================
@@ -748,18 +1415,11 @@ def admin_tickets():
 @app.route("/hol")
 def hall_of_loosers():
     """Hall of Loosers - Featured users"""
-    import json
-    DATA = os.path.join(os.getcwd(), "data")
-    
-    # Load from JSON file for backward compatibility
-    try:
-        with open(os.path.join(DATA, "hol.json"), "r", encoding="utf-8") as file:
-            data = json.load(file)
-            loosers_list = data.get("loosers", [])
-    except:
-        loosers_list = []
+    # The navbar depends on the logged-in user, so only anonymous pages are cached
+    if current_user.is_authenticated:
+        return render_template('hol.html', loosers_list=HOL_DATA.load())
     
-    return render_template('hol.html', loosers_list=loosers_list)
+    return HOL_DATA.render(lambda loosers_list: render_template('hol.html', loosers_list=loosers_list))
 
 
 # ============================================================================
@@ -769,10 +1429,7 @@ def hall_of_loosers():
 @app.route("/tos")
 def tos():
     """Terms of Service"""
-    DATA = os.path.join(os.getcwd(), "data")
-    with open(os.path.join(DATA, "tos"), "r", encoding="utf-8") as file:
-        filec = file.read()
-    return render_template("tos.html", file_content=filec)
+    return TOS_DATA.render(lambda filec: render_template("tos.html", file_content=filec))
 
 
 @app.route("/links")
@@ -787,6 +1444,7 @@ def list_of_pages():
 # ============================================================================
 
 @app.route("/api/users")
+@read_only
 def api_users():
     """API: Get all users"""
     users = db_session.query(User).all()
@@ -798,7 +1456,28 @@ def api_users():
     } for u in users])
 
 
+@app.route("/api/leaderboard")
+@read_only
+def api_leaderboard():
+    """API: Users by reputation, best first (?offset=, ?limit=)"""
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', LEADERBOARD_SIZE, type=int), 1), LEADERBOARD_PAGE_MAX)
+    users, total = LEADERBOARD.top(db_session, limit, offset)
+    return jsonify({'users': users, 'total': total})
+
+
+@app.route("/api/leaderboard/<username>")
+@read_only
+def api_leaderboard_rank(username):
+    """API: A user's leaderboard rank"""
+    rank = LEADERBOARD.rank(db_session, username)
+    if rank is None:
+        return jsonify({'error': 'User not on the leaderboard'}), 404
+    return jsonify(rank)
+
+
 @app.route("/api/pastes")
+@read_only
 def api_pastes():
     """API: Get public pastes"""
     pastes = db_session.query(Paste).filter_by(
@@ -808,6 +1487,7 @@ def api_pastes():
     
     return jsonify([{
         'id': str(p.id),
+        'short_id': p.short_id,
         'title': p.title,
         'language': p.language,
         'views': p.views,
@@ -816,6 +1496,161 @@ def api_pastes():
     } for p in pastes])
 
 
+def profile_page_args():
+    """Cursor and page size from ?before= and ?limit="""
+    before = request.args.get('before') or None
+    limit = min(max(request.args.get('limit', 20, type=int), 1), PROFILE_PAGE_MAX)
+    return before, limit
+
+
+@app.route("/api/users/<username>/pastes")
+@read_only
+def api_user_pastes(username):
+    """API: Page through a user's public pastes, newest first"""
+    before, limit = profile_page_args()
+    try:
+        pastes, next_cursor = paste_page(db_session, username, before, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'pastes': [dict(p, created_date=p['created_date'].isoformat()) for p in pastes],
+        'next': next_cursor
+    })
+
+
+@app.route("/api/users/<username>/comments")
+@read_only
+def api_user_comments(username):
+    """API: Page through the comments on a user's profile, newest first"""
+    before, limit = profile_page_args()
+    try:
+        comments, next_cursor = comment_page(db_session, username, before, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'comments': [dict(c, created_at=c['created_at'].isoformat()) for c in comments],
+        'next': next_cursor
+    })
+
+
+def batch_quota():
+    """(max pastes per batch, rate limit) for the current user's tier"""
+    return BATCH_PASTE_LIMITS.get(current_user.tier, BATCH_PASTE_LIMITS['free'])
+
+
+@app.route("/api/pastes/batch", methods=['POST'])
+@login_required
+@limiter.limit(lambda: batch_quota()[1], key_func=lambda: current_user.username)
+def api_pastes_batch():
+    """API: Create many pastes in one transaction"""
+    data = request.get_json(silent=True)
+    items = data.get('pastes') if isinstance(data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a JSON object with a non-empty "pastes" list'}), 400
+    
+    max_items = batch_quota()[0]
+    if len(items) > max_items:
+        return jsonify({'error': f'At most {max_items} pastes per batch for {current_user.tier} accounts'}), 400
+    
+    size_limit = paste_size_limit(current_user)
+    screened = current_user.role not in ['admin', 'manager', 'mod']
+    now = datetime.utcnow()
+    ids = []
+    short_ids = []
+    errors = []
+    rows = []
+    entries = []
+    
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            ids.append(None)
+            short_ids.append(None)
+            errors.append({'index': index, 'error': 'Paste must be an object'})
+            continue
+        
+        title = item.get('title', 'Untitled')
+        content = item.get('content', '')
+        language = item.get('language', 'text')
+        is_public = item.get('is_public', True)
+        
+        if not isinstance(title, str) or not isinstance(content, str) or not isinstance(language, str):
+            error = 'title, content and language must be strings'
+        elif not isinstance(is_public, bool):
+            error = 'is_public must be a boolean'
+        elif not content.strip():
+            error = 'Paste content cannot be empty'
+        elif len(content.encode('utf-8')) > size_limit:
+            error = f'Paste is too large (limit {size_limit // 1024} KB for your account)'
+        elif len(title) > 255 or len(language) > 50:
+            error = 'title or language is too long'
+        else:
+            error = None
+        
+        # Same screening as the form, plus repeats within this batch
+        if not error:
+            entry = fingerprint(new_id(), content.strip(), current_user.username, created_at=now)
+            if screened:
+                verdict, _ = screen_paste(db_session, entry)
+                if verdict == 'duplicate' or any(other.content_hash == entry.content_hash for other in entries):
+                    error = 'You already posted this paste'
+                elif verdict == 'spam':
+                    error = 'Too many similar pastes were posted recently, please try again later'
+        
+        if error:
+            ids.append(None)
+            short_ids.append(None)
+            errors.append({'index': index, 'error': error})
+            continue
+        
+        paste_id = entry.paste_id
+        entries.append(entry)
+        ids.append(paste_id)
+        short_ids.append(short_id_for(paste_id))
+        rows.append({
+            'id': paste_id,
+            'short_id': short_ids[-1],
+            'title': title.strip().replace("/", "%2F"),
+            'content': content.strip(),
+            'language': language,
+            'is_public': is_public,
+            'expires_at': None,
+            'created_by': current_user.username,
+            'created_date': now
+        })
+    
+    if rows:
+        try:
+            db_session.execute(Paste.__table__.insert(), rows)
+            for entry in entries:
+                record_fingerprint(db_session, entry)
+            current_user.paste_count += len(rows)
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            return jsonify({'error': f'Error creating pastes: {str(e)}'}), 500
+        
+        for entry in entries:
+            PASTE_FINGERPRINTS.add(entry)
+        invalidate_profile(current_user.username)
+        
+        log_security_event(
+            'paste_create',
+            success=True,
+            user_id=current_user.username,
+            additional_data={'batch': True, 'count': len(rows), 'paste_ids': [row['id'] for row in rows]}
+        )
+    
+    return jsonify({
+        'ids': ids,
+        'short_ids': short_ids,
+        'created': len(rows),
+        'errors': errors
+    }), 201 if rows else 400
+
+
 # ============================================================================
 # ERROR HANDLERS
 # ============================================================================
@@ -837,6 +1672,7 @@ def server_error(e):
 if __name__ == "__main__":
     # Initialize database
     print("🚀 Initializing skids.rest...")
+    create_app()
     init_db()
     print("✅ Database initialized!")
     
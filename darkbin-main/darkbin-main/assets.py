@@ -0,0 +1,100 @@
+"""
+Fingerprinted static assets: template helpers and precompressed serving
+
+Templates call static_url('legacy/app.css') or static_bundle('index.css')
+(or 'paste.css', 'core.js').
+When build_assets.py has been run they resolve to content-hashed files under
+/assets/, served with Cache-Control: immutable and the .br/.gz copy the
+client accepts. Without a build they fall back to the plain /static/ files.
+"""
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from static_data import StaticDataFile
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Stylesheets served as one file, in cascade order
+ASSET_BUNDLES = {
+    'index.css': [
+        'legacy/index.css',
+        'legacy/css/main.css',
+        'legacy/dropdown.css',
+        'files/darkbin.css',
+        'others/font-awesome.css',
+        'others/bootstrap.css',
+        'others/bootstrap.min.css',
+        'others/bootstrap-responsive.css',
+        'others/bootstrap-responsive.min.css',
+    ],
+    'paste.css': [
+        'legacy/app.css',
+        'legacy/google-code-prettify/tomorrow-night.css',
+        'legacy/css/show.css',
+        'legacy/toastr/toastr.min.css',
+        'files/darkbin.css',
+    ],
+    # Scripts the legacy page templates load together
+    'core.js': [
+        'legacy/custom.modernizr.js',
+        'legacy/jquery.min.js',
+    ],
+}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# (encoding, file suffix), most preferred first
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = StaticDataFile(MANIFEST_PATH, json.load, default={}, required=False)
+
+
+def static_url(filename):
+    """URL of a static file, fingerprinted when a build is available"""
+    built = _manifest.load().get('files', {}).get(filename)
+    if built:
+        return url_for('serve_asset', filename=built)
+    return url_for('static', filename=filename)
+
+
+def static_bundle(name):
+    """URLs to link for a bundle: the built bundle, or its source files"""
+    built = _manifest.load().get('bundles', {}).get(name)
+    if built:
+        return [url_for('serve_asset', filename=built)]
+    return [url_for('static', filename=filename) for filename in ASSET_BUNDLES[name]]
+
+
+def serve_asset(filename):
+    """Serve a built asset, preferring a precompressed variant"""
+    path = safe_join(DIST_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in PRECOMPRESSED:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def register_assets(app, limiter=None):
+    """Add the /assets/ route and the template helpers to an app (exempt from limiter's limits)"""
+    view = limiter.exempt(serve_asset) if limiter is not None else serve_asset
+    app.add_url_rule('/assets/<path:filename>', 'serve_asset', view)
+    app.jinja_env.globals.update(static_url=static_url, static_bundle=static_bundle)
@@ -0,0 +1,171 @@
+"""
+Backpressure for Socket.IO chat traffic
+
+Flask-Limiter only sees HTTP requests, so chat events are limited here, in
+process: every send_message costs a token from its socket's bucket and from
+its user's bucket (a user with several tabs shares one), and is refused when
+either is empty.
+
+On the way out, each client's Engine.IO queue is capped at
+SOCKET_QUEUE_MAX packets. A client that reads slower than the room talks
+stops receiving messages once its queue is full. By default it is then
+disconnected and its backlog thrown away; on reconnect the chat page catches
+up with `sync`. Counters for both sides are in BACKPRESSURE_STATS.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+CHAT_SOCKET_RATE = float(os.getenv('CHAT_SOCKET_RATE', 1))
+CHAT_SOCKET_BURST = int(os.getenv('CHAT_SOCKET_BURST', 5))
+CHAT_USER_RATE = float(os.getenv('CHAT_USER_RATE', 2))
+CHAT_USER_BURST = int(os.getenv('CHAT_USER_BURST', 10))
+SOCKET_QUEUE_MAX = int(os.getenv('SOCKET_QUEUE_MAX', 256))
+SOCKET_SLOW_POLICY = os.getenv('SOCKET_SLOW_POLICY', 'disconnect')  # or 'drop'
+
+BACKPRESSURE_STATS = Counter()
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` per second"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self):
+        """Seconds until a token is available"""
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate else float('inf')
+
+
+class ChatThrottle:
+    """Per-socket and per-user token buckets for chat messages"""
+
+    def __init__(self, socket_rate=CHAT_SOCKET_RATE, socket_burst=CHAT_SOCKET_BURST,
+                 user_rate=CHAT_USER_RATE, user_burst=CHAT_USER_BURST):
+        self.enabled = True
+        self.socket_limits = (socket_rate, socket_burst)
+        self.user_limits = (user_rate, user_burst)
+        self._sockets = {}
+        self._users = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def allow(self, sid, username):
+        """
+        Take a token for one message.
+
+        Returns 0 when the message may go out, else the seconds until it
+        could. A refused message costs nothing.
+        """
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            socket_bucket = self._bucket(self._sockets, sid, self.socket_limits, now)
+            user_bucket = self._bucket(self._users, username, self.user_limits, now)
+            if now - self._pruned_at > 60:
+                self._prune(now)
+            for kind, bucket in (('socket', socket_bucket), ('user', user_bucket)):
+                if bucket.refill(now) < 1:
+                    BACKPRESSURE_STATS[f'throttled_{kind}'] += 1
+                    return bucket.wait_time()
+            socket_bucket.tokens -= 1
+            user_bucket.tokens -= 1
+        BACKPRESSURE_STATS['chat_allowed'] += 1
+        return 0
+
+    @staticmethod
+    def _bucket(buckets, key, limits, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(*limits, now)
+        return bucket
+
+    def _prune(self, now):
+        # A bucket that has refilled is the same as no bucket
+        self._pruned_at = now
+        for buckets in (self._sockets, self._users):
+            for key in [key for key, bucket in buckets.items() if bucket.refill(now) >= bucket.burst]:
+                del buckets[key]
+
+    def forget(self, sid):
+        """Drop a disconnected socket's bucket"""
+        with self._lock:
+            self._sockets.pop(sid, None)
+
+    def __len__(self):
+        return len(self._sockets) + len(self._users)
+
+
+CHAT_THROTTLE = ChatThrottle()
+
+
+class OutboundLimiter:
+    """Caps each client's Engine.IO send queue; see the module docstring"""
+
+    def __init__(self, limit=SOCKET_QUEUE_MAX, policy=SOCKET_SLOW_POLICY):
+        self.limit = limit
+        self.policy = policy
+        self.eio = None
+        self._closing = set()
+
+    def install(self, server):
+        """Wrap the Engine.IO server under a python-socketio server"""
+        from engineio import packet
+
+        eio = self.eio = server.eio
+        send_packet = eio.send_packet
+
+        def bounded_send_packet(sid, pkt):
+            socket = eio.sockets.get(sid)
+            if socket is not None and pkt.packet_type == packet.MESSAGE and (
+                    sid in self._closing or socket.queue.qsize() >= self.limit):
+                BACKPRESSURE_STATS['dropped_packets'] += 1
+                if self.policy == 'disconnect' and sid not in self._closing:
+                    self._closing.add(sid)
+                    # Not inline: this runs inside someone else's emit loop
+                    eio.start_background_task(self._disconnect, sid)
+                return
+            send_packet(sid, pkt)
+
+        eio.send_packet = bounded_send_packet
+
+    def _disconnect(self, sid):
+        socket = self.eio.sockets.get(sid)
+        try:
+            if socket is None:
+                return
+            # Throw the backlog away so the writer stops right after the packet in flight
+            empty = self.eio.get_queue_empty_exception()
+            try:
+                while True:
+                    socket.queue.get(block=False)
+                    socket.queue.task_done()
+            except empty:
+                pass
+            socket.close(wait=False, abort=True)
+            self.eio.sockets.pop(sid, None)
+            BACKPRESSURE_STATS['disconnected_slow'] += 1
+        finally:
+            self._closing.discard(sid)
+
+    def queue_depths(self):
+        """Largest and total send queue length over this worker's clients"""
+        if self.eio is None:
+            return {'clients': 0, 'max': 0, 'total': 0}
+        depths = [socket.queue.qsize() for socket in list(self.eio.sockets.values())]
+        return {'clients': len(depths), 'max': max(depths, default=0), 'total': sum(depths)}
+
+
+OUTBOUND_LIMITER = OutboundLimiter()
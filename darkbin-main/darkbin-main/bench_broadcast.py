@@ -0,0 +1,267 @@
+"""
+Chat broadcast benchmark for skids.rest
+
+Starts the production server (gunicorn, one eventlet worker) once per
+CHAT_COALESCE_MS setting, connects --readers websocket clients and sends
+chat messages at --rate per second. For each run it reports the worker's
+CPU time (from /proc), the websocket frames and messages the readers
+received - the worker makes one socket write per frame and client - and
+the delivery latency:
+
+    python bench_broadcast.py --readers 50 --rate 200 --window-ms 0 --window-ms 25
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from simple_websocket import Client, ConnectionClosed
+
+from bench_http import BENCH_PASSWORD, git_revision, percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='skids.rest chat broadcast benchmark')
+    parser.add_argument('--readers', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=200,
+                        help='Messages sent per second')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--size', type=int, default=100,
+                        help='Message size in bytes')
+    parser.add_argument('--window-ms', type=float, action='append', default=None,
+                        help='CHAT_COALESCE_MS to run with (repeatable, default 0 and 25)')
+    parser.add_argument('--max-ms', type=float, default=100,
+                        help='CHAT_COALESCE_MAX_MS for the coalesced runs')
+    parser.add_argument('--port', type=int, default=5057)
+    parser.add_argument('--output', default=None,
+                        help='Write JSON report here (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def prepare_database(db_path):
+    """Create the schema and the bench user the clients log in as"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    import app_new
+    from database import db_session, init_db
+    from models import User
+
+    app_new.create_app()
+    init_db()
+    db_session.add(User(
+        username='bench',
+        password=app_new.bcrypt.generate_password_hash(BENCH_PASSWORD).decode('utf-8')
+    ))
+    db_session.commit()
+    db_session.remove()
+
+
+def start_server(args, db_path, window_ms, workdir):
+    """gunicorn with one eventlet worker; returns (process, worker pid)"""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'SECRET_KEY': 'bench-secret',
+        'SCHEDULER_ENABLED': 'False',
+        'BIND': f'127.0.0.1:{args.port}',
+        'WEB_CONCURRENCY': '1',
+        'GUNICORN_WORKER_CLASS': 'eventlet',
+        'GUNICORN_PIDFILE': os.path.join(workdir, 'gunicorn.pid'),
+        'GUNICORN_ACCESS_LOG': os.devnull,
+        'CHAT_COALESCE_MS': str(window_ms),
+        'CHAT_COALESCE_MAX_MS': str(args.max_ms),
+        # The sender is one user on one socket
+        'CHAT_SOCKET_RATE': str(args.rate * 2),
+        'CHAT_SOCKET_BURST': str(int(args.rate)),
+        'CHAT_USER_RATE': str(args.rate * 2),
+        'CHAT_USER_BURST': str(int(args.rate)),
+        'SOCKET_QUEUE_MAX': '100000',
+    })
+    log = open(os.path.join(workdir, f'server-{window_ms:g}.log'), 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app_new:create_app()'],
+        cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{args.port}/login', timeout=1)
+            break
+        except requests.RequestException:
+            time.sleep(0.2)
+    else:
+        server.terminate()
+        raise RuntimeError('server did not start, see ' + log.name)
+    with open(f'/proc/{server.pid}/task/{server.pid}/children') as f:
+        worker_pid = int(f.read().split()[0])
+    return server, worker_pid
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time of a process so far"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class Reader:
+    """A chat client that counts frames and messages and times delivery"""
+
+    def __init__(self, url, cookie):
+        self.ws = Client.connect(url, headers={'Cookie': cookie})
+        # Join the namespace without waiting for Engine.IO's open packet:
+        # when it comes in with the handshake response, the client only
+        # hands it over once more data arrives
+        self.ws.send('40')
+        while not (self.ws.receive() or '').startswith('40'):
+            pass
+        self.frames = 0
+        self.messages = 0
+        self.latencies = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            while True:
+                packet = self.ws.receive()
+                if packet == '2':
+                    self.ws.send('3')
+                    continue
+                if not packet or not packet.startswith('42'):
+                    continue
+                event, data = json.loads(packet[2:])
+                received = time.time()
+                if event == 'new_message':
+                    batch = [data]
+                elif event == 'new_messages':
+                    batch = data['messages']
+                else:
+                    continue
+                self.frames += 1
+                self.messages += len(batch)
+                for message in batch:
+                    self.latencies.append(received - float(message['content'].split(' ', 1)[0]))
+        except ConnectionClosed:
+            pass
+
+
+def run_once(args, db_path, window_ms, workdir):
+    """One server, one sending burst; returns the run's numbers"""
+    server, worker_pid = start_server(args, db_path, window_ms, workdir)
+    base = f'http://127.0.0.1:{args.port}'
+    url = f'ws://127.0.0.1:{args.port}/socket.io/?EIO=4&transport=websocket'
+    try:
+        session = requests.Session()
+        session.post(base + '/login', data={'username': 'bench', 'password': BENCH_PASSWORD})
+        cookie = '; '.join(f'{name}={value}' for name, value in session.cookies.items())
+        readers = [Reader(url, cookie) for _ in range(args.readers)]
+        sender = Reader(url, cookie)
+
+        time.sleep(0.5)
+        before = cpu_seconds(worker_pid)
+        total = int(args.rate * args.seconds)
+        padding = 'x' * max(0, args.size - 18)
+        started = time.perf_counter()
+        for i in range(total):
+            delay = started + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            message = f'{time.time():.6f} {padding}'
+            sender.ws.send('42' + json.dumps(['send_message', {'message': message, 'room': 'global'}]))
+
+        # Let the last frames arrive
+        expected = total * (args.readers + 1)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if sum(reader.messages for reader in readers + [sender]) >= expected:
+                break
+            time.sleep(0.1)
+        time.sleep(0.2)
+        cpu = cpu_seconds(worker_pid) - before
+
+        clients = readers + [sender]
+        latencies = sorted(latency for reader in clients for latency in reader.latencies)
+        delivered = sum(reader.messages for reader in clients)
+        frames = sum(reader.frames for reader in clients)
+        result = {
+            'coalesce_ms': window_ms,
+            'sent': total,
+            'messages_delivered': delivered,
+            'messages_expected': expected,
+            'frames_delivered': frames,
+            'messages_per_frame': round(delivered / frames, 2) if frames else 0,
+            'worker_cpu_s': round(cpu, 3),
+            'cpu_ms_per_1k_deliveries': round(cpu * 1e6 / delivered, 2) if delivered else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 1),
+                'p99': round(percentile(latencies, 99) * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1) if latencies else 0,
+            },
+        }
+        for client in clients:
+            try:
+                client.ws.close()
+            except ConnectionClosed:
+                pass
+        return result
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main(argv=None):
+    """Run each window setting against the same database and emit the JSON report"""
+    args = parse_args(argv)
+    windows = args.window_ms or [0, 25]
+
+    workdir = tempfile.mkdtemp(prefix='skids-bench-broadcast-')
+    db_path = os.path.join(workdir, 'bench.db')
+    prepare_database(db_path)
+
+    runs = []
+    for window_ms in windows:
+        print(f'⏱️  CHAT_COALESCE_MS={window_ms:g}...', file=sys.stderr)
+        runs.append(run_once(args, db_path, window_ms, workdir))
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'readers': args.readers,
+        'rate': args.rate,
+        'seconds': args.seconds,
+        'message_size': args.size,
+        'coalesce_max_ms': args.max_ms,
+        'runs': runs,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'✅ Report written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+    import shutil
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+"""
+HTTP load benchmark for skids.rest
+
+Boots app_new.create_app() against a local, freshly seeded database and drives the
+main routes plus the Socket.IO send_message path at a fixed concurrency.
+Results are written as JSON so runs can be diffed between commits:
+
+    python bench_http.py --requests 500 --concurrency 8 --output bench.json
+    python bench_http.py --replica-check --pastes 500   # read routing with a replica
+
+A scenario whose share of non-2xx/3xx responses and exceptions is above
+--max-error-rate is marked "ok": false and the run exits with status 1, so
+its latencies (mostly error pages) are not mistaken for a real result.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = 'benchpass123'
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='skids.rest HTTP load benchmark')
+    parser.add_argument('--db', default=None,
+                        help='SQLite file to seed (default: temporary file)')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--pastes', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--paste-size', type=int, default=4000,
+                        help='Average paste body size in bytes')
+    parser.add_argument('--requests', type=int, default=300,
+                        help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='Unmeasured requests per scenario')
+    parser.add_argument('--scenario', action='append', default=None,
+                        help='Only run the named scenario (repeatable)')
+    parser.add_argument('--seed', type=int, default=1337)
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='Fail a scenario above this share of non-2xx/3xx responses or exceptions')
+    parser.add_argument('--output', default=None,
+                        help='Write JSON report here (default: stdout)')
+    parser.add_argument('--replica-check', action='store_true',
+                        help='Instead of the scenarios, check read routing against a SQLite replica')
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def git_revision():
+    """Current commit hash, if available"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def boot_app(db_path):
+    """Point the app at a local database and import it"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('SECRET_KEY', 'bench-secret')
+
+    import app_new
+    from database import init_db
+
+    app_new.create_app()
+    app_new.app.config['TESTING'] = False
+    app_new.limiter.enabled = False
+    app_new.CHAT_THROTTLE.enabled = False
+    with contextlib.redirect_stdout(sys.stderr):
+        init_db()
+    return app_new
+
+
+def seed_database(app_new, args, rng):
+    """Insert users, pastes, comments and chat messages in bulk"""
+    from database import engine
+    from ids import short_id_for
+    from models import User, Paste, Comment, ChatMessage
+
+    password_hash = app_new.bcrypt.generate_password_hash(BENCH_PASSWORD).decode('utf-8')
+    now = datetime.utcnow()
+    filler = 'lorem ipsum dolor sit amet consectetur adipiscing elit '
+
+    def body(size):
+        return (filler * (size // len(filler) + 1))[:size]
+
+    usernames = [f'benchuser{i}' for i in range(args.users)]
+    users = [{
+        'username': name,
+        'password': password_hash,
+        'email': f'{name}@bench.local',
+        'role': 'user',
+        'tier': 'premium' if i % 10 == 0 else 'free',
+        'joined_date': now - timedelta(days=rng.randint(0, 900)),
+    } for i, name in enumerate(usernames)]
+
+    pastes = []
+    for i in range(args.pastes):
+        size = max(16, int(rng.expovariate(1.0 / args.paste_size)))
+        pastes.append({
+            'title': f'bench paste {i}',
+            'content': body(size),
+            'language': 'text',
+            'is_public': rng.random() > 0.05,
+            'created_by': rng.choice(usernames) if rng.random() > 0.4 else 'anonymous',
+            'created_date': now - timedelta(seconds=rng.randint(0, 86400 * 365)),
+            'is_pinned': i < 10,
+            'pinned_at': now if i < 10 else None,
+        })
+
+    comments = [{
+        'content': body(rng.randint(10, 400)),
+        'created_by': rng.choice(usernames),
+        'profile_user': rng.choice(usernames),
+        'created_at': now - timedelta(seconds=rng.randint(0, 86400 * 365)),
+    } for _ in range(args.comments)]
+
+    messages = []
+    for _ in range(args.messages):
+        name = rng.choice(usernames)
+        messages.append({
+            'user_id': name,
+            'username': name,
+            'content': body(rng.randint(5, 200)),
+            'room': 'global',
+            'created_at': now - timedelta(seconds=rng.randint(0, 86400 * 30)),
+        })
+
+    with engine.begin() as conn:
+        for model, rows in ((User, users), (Paste, pastes),
+                            (Comment, comments), (ChatMessage, messages)):
+            for row in rows:
+                row.setdefault('id', str(uuid.uuid4()))
+            if rows:
+                conn.execute(model.__table__.insert(), rows)
+
+    return {
+        'usernames': usernames,
+        'paste_ids': [short_id_for(p['id']) for p in pastes if p['is_public']],
+    }
+
+
+class Scenario:
+    """A named request generator run against a per-thread client"""
+
+    def __init__(self, name, func, needs_login=False, socket=False):
+        self.name = name
+        self.func = func
+        self.needs_login = needs_login
+        self.socket = socket
+
+
+def build_scenarios(seeded):
+    """The routes covered by the benchmark"""
+    usernames = seeded['usernames']
+    paste_ids = seeded['paste_ids']
+
+    def index(ctx, rng):
+        return ctx['http'].get('/').status_code
+
+    def view_paste(ctx, rng):
+        return ctx['http'].get(f'/paste/{rng.choice(paste_ids)}').status_code
+
+    def new_paste(ctx, rng):
+        return ctx['http'].post('/new_paste', data={
+            'pasteTitle': f'bench new {rng.random()}',
+            'pasteContent': 'x' * rng.randint(100, 8000),
+        }).status_code
+
+    def user_profile(ctx, rng):
+        return ctx['http'].get(f'/user/{rng.choice(usernames)}').status_code
+
+    def api_pastes(ctx, rng):
+        return ctx['http'].get('/api/pastes').status_code
+
+    def send_message(ctx, rng):
+        ack = ctx['socket'].emit('send_message', {'message': f'bench {rng.random()}'}, callback=True)
+        ctx['socket'].get_received()
+        if not isinstance(ack, dict) or 'id' not in ack:
+            raise RuntimeError(f'send_message was not acked: {ack!r}')
+        return 200
+
+    return [
+        Scenario('index', index),
+        Scenario('view_paste', view_paste),
+        Scenario('new_paste', new_paste),
+        Scenario('user_profile', user_profile),
+        Scenario('api_pastes', api_pastes),
+        Scenario('socketio_send_message', send_message, needs_login=True, socket=True),
+    ]
+
+
+def make_context(app_new, scenario, username):
+    """Create the per-thread HTTP (and Socket.IO) client"""
+    http = app_new.app.test_client()
+    ctx = {'http': http}
+    if scenario.needs_login:
+        http.post('/login', data={'username': username, 'password': BENCH_PASSWORD})
+    if scenario.socket:
+        ctx['socket'] = app_new.socketio.test_client(app_new.app, flask_test_client=http)
+    return ctx
+
+
+def run_scenario(app_new, scenario, seeded, args):
+    """Drive one scenario and return its latency summary"""
+    local = threading.local()
+    counter_lock = threading.Lock()
+    statuses = {}
+    latencies = []
+    errors = []
+
+    def worker(i, measure):
+        rng = random.Random(args.seed * 1000003 + i)
+        if not hasattr(local, 'ctx'):
+            username = seeded['usernames'][threading.get_ident() % len(seeded['usernames'])]
+            local.ctx = make_context(app_new, scenario, username)
+        start = time.perf_counter()
+        try:
+            status = str(scenario.func(local.ctx, rng))
+        except Exception as e:
+            status = 'exception'
+            if measure and len(errors) < 5:
+                errors.append(f'{type(e).__name__}: {e}')
+        elapsed = time.perf_counter() - start
+        if measure:
+            with counter_lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda i: worker(i, False), range(args.warmup)))
+        wall_start = time.perf_counter()
+        list(pool.map(lambda i: worker(i, True), range(args.requests)))
+        wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 3)
+    failed = sum(count for status, count in statuses.items() if status[:1] not in ('2', '3'))
+    error_rate = failed / len(latencies) if latencies else 0
+    return {
+        'ok': bool(latencies) and error_rate <= args.max_error_rate,
+        'error_rate': round(error_rate, 4),
+        'requests': len(latencies),
+        'concurrency': args.concurrency,
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else 0,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]) if latencies else 0,
+        },
+        'statuses': statuses,
+        'sample_errors': errors,
+    }
+
+
+def check_replicas(app_new, seeded, db_path, replica_path):
+    """
+    Read routing with a primary and a replica SQLite file: the replica is a
+    copy of the seeded primary plus one paste only it has, so every read of
+    /api/pastes shows which database answered. Returns {check: passed}.
+    """
+    import shutil
+    import sqlite3
+    from sqlalchemy import create_engine
+    from database import SessionLocal, get_engines
+    from models import Paste
+
+    os.makedirs(os.path.dirname(replica_path), exist_ok=True)
+    source, copy = sqlite3.connect(db_path), sqlite3.connect(replica_path)
+    source.backup(copy)
+    source.close()
+    copy.close()
+    replica_writer = create_engine(f'sqlite:///{replica_path}')
+    with replica_writer.begin() as conn:
+        conn.execute(Paste.__table__.insert().values(
+            id=str(uuid.uuid4()), title='replica only', content='only on the replica',
+            created_by='anonymous', created_date=datetime.utcnow() + timedelta(days=1)
+        ))
+    replica_writer.dispose()
+
+    def titles(client):
+        try:
+            response = client.get('/api/pastes')
+        except Exception:
+            return set()
+        return {paste['title'] for paste in response.get_json()} if response.status_code == 200 else set()
+
+    checks = {}
+
+    # A read_only session that has flushed reads its own write from the primary
+    session = SessionLocal()
+    session.info['read_only'] = True
+    try:
+        session.add(Paste(title='session write', content='flushed, not committed', created_by='anonymous'))
+        session.flush()
+        checks['session_reads_own_write'] = session.query(Paste).filter_by(title='session write').count() == 1
+    finally:
+        session.rollback()
+        session.close()
+
+    # A client that has just written keeps reading from the primary
+    writer = app_new.app.test_client()
+    writer.post('/login', data={'username': seeded['usernames'][0], 'password': BENCH_PASSWORD})
+    writer.post('/api/pastes/batch', json={'pastes': [{'title': 'request write', 'content': 'written through the api'}]})
+    seen = titles(writer)
+    checks['writer_reads_primary'] = 'request write' in seen and 'replica only' not in seen
+
+    # Any other client reads from the replica
+    seen = titles(app_new.app.test_client())
+    checks['fresh_client_reads_replica'] = 'replica only' in seen and 'request write' not in seen
+
+    # With the replica gone, the failed read takes it out of rotation and
+    # the next ones are served by the primary
+    shutil.rmtree(os.path.dirname(replica_path))
+    for replica in get_engines()[2].engines:
+        replica.dispose()
+    reader = app_new.app.test_client()
+    titles(reader)
+    seen = titles(reader)
+    checks['dead_replica_falls_back'] = 'request write' in seen and 'replica only' not in seen
+
+    for name, passed in checks.items():
+        print(f"{'✅' if passed else '❌'} {name}", file=sys.stderr)
+    return checks
+
+
+def main(argv=None):
+    """Seed, run every scenario and emit the JSON report"""
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    tmpdir = None
+    db_path = args.db
+    if db_path is None:
+        tmpdir = tempfile.mkdtemp(prefix='skids-bench-')
+        db_path = os.path.join(tmpdir, 'bench.db')
+    elif os.path.exists(db_path):
+        os.remove(db_path)
+
+    replica_path = None
+    if args.replica_check:
+        replica_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'replica', 'bench-replica.db')
+        if os.path.exists(replica_path):
+            os.remove(replica_path)
+        os.environ['DATABASE_REPLICA_URLS'] = f'sqlite:///{replica_path}'
+
+    app_new = boot_app(db_path)
+
+    seed_start = time.perf_counter()
+    seeded = seed_database(app_new, args, rng)
+    seed_seconds = time.perf_counter() - seed_start
+
+    results = {}
+    replica_checks = None
+    if args.replica_check:
+        replica_checks = check_replicas(app_new, seeded, db_path, replica_path)
+    for scenario in build_scenarios(seeded):
+        if args.replica_check or args.scenario and scenario.name not in args.scenario:
+            continue
+        print(f'⏱️  {scenario.name}...', file=sys.stderr)
+        result = results[scenario.name] = run_scenario(app_new, scenario, seeded, args)
+        if not result['ok']:
+            print(f'❌ {scenario.name}: {result["error_rate"]:.1%} of requests failed '
+                  f'(statuses {result["statuses"]})', file=sys.stderr)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': 'sqlite',
+        'dataset': {
+            'users': args.users,
+            'pastes': args.pastes,
+            'comments': args.comments,
+            'messages': args.messages,
+            'paste_size': args.paste_size,
+            'seed': args.seed,
+            'seed_seconds': round(seed_seconds, 3),
+        },
+        'scenarios': results,
+    }
+    if replica_checks is not None:
+        report['replica_check'] = replica_checks
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'✅ Report written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+    if tmpdir:
+        import shutil
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    passed = all(result['ok'] for result in results.values()) and all((replica_checks or {}).values())
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
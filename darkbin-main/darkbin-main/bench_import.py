@@ -0,0 +1,140 @@
+"""
+Startup benchmark for skids.rest
+
+Times `import app_new` and `create_app()` in fresh interpreters (so nothing
+is already in sys.modules) and lists the slowest imports reported by
+`python -X importtime`. Results are JSON so runs can be diffed between
+commits; --max-ms makes it usable as a regression gate in CI:
+
+    python bench_import.py --runs 7 --max-ms 600 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from bench_http import git_revision
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Run in the child interpreter; prints its timings as one JSON line
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+{factory}
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "create_ms": (t2 - t1) * 1000}}))
+'''
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='skids.rest startup benchmark')
+    parser.add_argument('--module', default='app_new')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15,
+                        help='Slowest imports to list')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Exit 1 if the median import time exceeds this')
+    parser.add_argument('--output', default=None,
+                        help='Write JSON report here (default: stdout)')
+    return parser.parse_args(argv)
+
+
+def child_env():
+    """Environment for the probes: no database is touched by an import"""
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'skids-bench-import.db'))
+    env.setdefault('SECRET_KEY', 'bench-secret')
+    env['SCHEDULER_ENABLED'] = 'False'
+    return env
+
+
+def probe(module):
+    """Import time and create_app() time (ms) in a fresh interpreter"""
+    factory = f'getattr({module}, "create_app", lambda: None)()'
+    code = PROBE.format(module=module, factory=factory)
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=HERE, env=child_env(),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    """The module's direct imports by cumulative time, from -X importtime"""
+    err = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=HERE, env=child_env(), capture_output=True, text=True, check=True
+    ).stderr
+    packages = {}
+    for line in err.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        # importtime indents two spaces per nesting level; a direct import
+        # of the module includes everything it pulled in first
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth != 1:
+            continue
+        name = name.strip()
+        packages[name] = packages.get(name, 0) + int(cumulative) / 1000
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in ranked[:top]]
+
+
+def main(argv=None):
+    """Probe the module repeatedly and emit the JSON report"""
+    args = parse_args(argv)
+
+    samples = [probe(args.module) for _ in range(args.runs)]
+    imports = sorted(sample['import_ms'] for sample in samples)
+    creates = sorted(sample['create_ms'] for sample in samples)
+    median_import = statistics.median(imports)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'module': args.module,
+        'runs': args.runs,
+        'import_ms': {
+            'median': round(median_import, 1),
+            'min': round(imports[0], 1),
+            'max': round(imports[-1], 1),
+        },
+        'create_app_ms': {
+            'median': round(statistics.median(creates), 1),
+            'min': round(creates[0], 1),
+            'max': round(creates[-1], 1),
+        },
+        'slowest_imports': slowest_imports(args.module, args.top),
+        'max_ms': args.max_ms,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f'✅ Report written to {args.output}', file=sys.stderr)
+    else:
+        print(text)
+
+    if args.max_ms is not None and median_import > args.max_ms:
+        print(f'❌ Import took {median_import:.0f} ms (limit {args.max_ms:.0f} ms)', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Build fingerprinted, minified and precompressed static assets
+
+Every CSS/JS file referenced from templates/ through url_for('static', ...),
+static_url(...) or a bundle in ASSET_BUNDLES is minified, written to
+static/dist under a content-hash filename, and gzipped and brotli'd.
+static/dist/manifest.json maps the original names to the built ones;
+assets.py serves them. JS minification and the .br copies need rjsmin and
+brotli from requirements.txt; the build stops if either is missing.
+CSS uses rcssmin when it is installed, else a built-in minifier.
+
+    python build_assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+from assets import ASSET_BUNDLES, DIST_DIR, MANIFEST_PATH, STATIC_DIR
+
+# Optional, better CSS minifier
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import brotli
+    import rjsmin
+except ImportError as e:
+    sys.exit(f"❌ {e.name} is required to build assets: pip install -r requirements.txt")
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+STATIC_REFERENCE = re.compile(
+    r"""(?:url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*|static_url\(\s*)['"]([^'"]+)['"]"""
+)
+CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def referenced_assets():
+    """CSS/JS files referenced by the templates"""
+    found = set()
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(TEMPLATES_DIR, name), 'r', encoding='utf-8') as f:
+            for filename in STATIC_REFERENCE.findall(f.read()):
+                if filename.endswith(('.css', '.js')) and os.path.isfile(os.path.join(STATIC_DIR, filename)):
+                    found.add(filename)
+    for files in ASSET_BUNDLES.values():
+        found.update(files)
+    return sorted(found)
+
+
+def minify_css(css):
+    """Strip comments and redundant whitespace, leaving strings untouched"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+    strings = []
+
+    def stash(match):
+        strings.append(match.group(0))
+        return f'\0{len(strings) - 1}\0'
+
+    css = CSS_STRING.sub(stash, css)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: strings[int(m.group(1))], css)
+
+
+def minify_js(js, filename):
+    """Minify JavaScript; .min.js files are left alone"""
+    if filename.endswith('.min.js'):
+        return js
+    return rjsmin.jsmin(js)
+
+
+def rebase_css_urls(css, filename):
+    """Make relative url(...) references absolute, since built files move"""
+    base = posixpath.dirname(filename)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        return f'url({quote}' + posixpath.normpath(posixpath.join('/static', base, url)) + f'{quote})'
+
+    return CSS_URL.sub(rebase, css)
+
+
+def build_source(filename):
+    """Minified text for one static file"""
+    with open(os.path.join(STATIC_DIR, filename), 'r', encoding='utf-8', errors='replace') as f:
+        source = f.read()
+    if filename.endswith('.css'):
+        return minify_css(rebase_css_urls(source, filename))
+    return minify_js(source, filename)
+
+
+def write_asset(logical_name, content):
+    """Write a fingerprinted file plus compressed copies; return its dist path"""
+    data = content.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    root, ext = posixpath.splitext(logical_name)
+    built_name = f'{root}.{digest}{ext}'
+    path = os.path.join(DIST_DIR, *built_name.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(data, quality=11))
+    return built_name
+
+
+def build(clean=True, out=sys.stdout):
+    """Build every asset and bundle and write the manifest"""
+    if clean and os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR, exist_ok=True)
+
+    manifest = {'files': {}, 'bundles': {}}
+    original_bytes = built_bytes = 0
+    built = {}
+    for filename in referenced_assets():
+        content = build_source(filename)
+        built[filename] = content
+        manifest['files'][filename] = write_asset(filename, content)
+        original_bytes += os.path.getsize(os.path.join(STATIC_DIR, filename))
+        built_bytes += len(content.encode('utf-8'))
+
+    for bundle, files in ASSET_BUNDLES.items():
+        # ';' keeps a script without a trailing semicolon from running into the next
+        content = (';\n' if bundle.endswith('.js') else '\n').join(built[filename] for filename in files)
+        manifest['bundles'][bundle] = write_asset(f'bundles/{bundle}', content)
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"✅ Built {len(manifest['files'])} assets and {len(manifest['bundles'])} bundles "
+          f"({original_bytes // 1024} KiB -> {built_bytes // 1024} KiB minified, brotli, gzip)", file=out)
+    return manifest
+
+
+if __name__ == "__main__":
+    build()
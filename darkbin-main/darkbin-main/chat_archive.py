@@ -0,0 +1,283 @@
+"""
+Chat retention and archive
+
+Chat messages older than their room's retention (CHAT_RETENTION_DAYS, or a
+CHAT_ROOM_RETENTION override such as "staff=365,support=90"; 0 keeps a
+room's messages in the table) are moved out of chat_messages by the
+archive_chat scheduler job, in batches of CHAT_ARCHIVE_BATCH_SIZE.
+
+Each room has a directory under CHAT_ARCHIVE_DIR with append-only segment
+files of gzipped JSON lines, one gzip member per batch, and index.jsonl:
+one line per batch with its segment, byte offset and length, message
+count and first/last (created_at, id). A batch is written and indexed
+before its rows are deleted, and each batch's delete commits on its own
+as soon as its index line is on disk. If a delete does not commit, the
+next run finds those rows in the newest batches and deletes them instead
+of archiving them twice.
+Moderators read the archive newest first with the same cursors as chat
+history (/admin/chat/archive).
+
+    python chat_archive.py              # archive now instead of waiting for the job
+"""
+import hashlib
+import json
+import os
+import re
+import socket
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, distinct, select
+
+from models import ChatMessage
+from profiles import encode_cursor, decode_cursor
+
+CHAT_RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS', 30))
+CHAT_ARCHIVE_DIR = os.getenv('CHAT_ARCHIVE_DIR', 'chat_archive')
+CHAT_ARCHIVE_BATCH_SIZE = int(os.getenv('CHAT_ARCHIVE_BATCH_SIZE', 1000))
+CHAT_ARCHIVE_MAX_BATCHES = int(os.getenv('CHAT_ARCHIVE_MAX_BATCHES', 20))
+CHAT_ARCHIVE_INTERVAL = int(os.getenv('CHAT_ARCHIVE_INTERVAL', 3600))
+CHAT_SEGMENT_BYTES = int(os.getenv('CHAT_SEGMENT_BYTES', 8 * 1024 * 1024))
+
+
+def parse_room_retention(value):
+    """{room: days} from "room=days,room=days" """
+    retention = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            room, days = item.rsplit('=', 1)
+            retention[room.strip()] = int(days)
+    return retention
+
+
+CHAT_ROOM_RETENTION = parse_room_retention(os.getenv('CHAT_ROOM_RETENTION'))
+
+
+def retention_days(room):
+    return CHAT_ROOM_RETENTION.get(room, CHAT_RETENTION_DAYS)
+
+
+def message_record(row):
+    """An archived message: everything in its chat_messages row"""
+    return {
+        'id': str(row.id),
+        'user_id': row.user_id,
+        'username': row.username,
+        'content': row.content,
+        'room': row.room,
+        'created_at': row.created_at.isoformat(timespec='microseconds')
+    }
+
+
+def _key(record):
+    return record['created_at'], record['id']
+
+
+class ChatArchive:
+    """Segment files and batch index per room under one directory"""
+
+    def __init__(self, directory=CHAT_ARCHIVE_DIR, segment_bytes=CHAT_SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+
+    def room_dir(self, room):
+        # Room names come from clients; keep them out of the path
+        slug = re.sub(r'[^A-Za-z0-9_-]', '_', room)[:40]
+        digest = hashlib.sha1(room.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.directory, f'{slug}-{digest}')
+
+    def entries(self, room):
+        """The room's index, oldest batch first"""
+        try:
+            with open(os.path.join(self.room_dir(room), 'index.jsonl'), encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn last line from an interrupted append
+                break
+        return entries
+
+    def append(self, room, records):
+        """Write one batch (oldest first) as a new gzip member and index it"""
+        path = self.room_dir(room)
+        os.makedirs(path, exist_ok=True)
+        entries = self.entries(room)
+
+        segment, offset = '000001.jsonl.gz', 0
+        if entries:
+            last = entries[-1]
+            segment, offset = last['segment'], last['offset'] + last['length']
+            try:
+                size = os.path.getsize(os.path.join(path, segment))
+            except FileNotFoundError:
+                size = 0
+            if offset >= self.segment_bytes or size < offset:
+                segment, offset = f'{int(segment.split(".")[0]) + 1:06d}.jsonl.gz', 0
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        body = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        data = compressor.compress(body.encode('utf-8')) + compressor.flush()
+
+        segment_path = os.path.join(path, segment)
+        with open(segment_path, 'ab') as f:
+            # Drop anything past the last indexed batch (an append that never got indexed)
+            if f.tell() != offset:
+                f.truncate(offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = {
+            'segment': segment,
+            'offset': offset,
+            'length': len(data),
+            'count': len(records),
+            'first': list(_key(records[0])),
+            'last': list(_key(records[-1]))
+        }
+        with open(os.path.join(path, 'index.jsonl'), 'a+b') as f:
+            f.seek(0)
+            index = f.read()
+            if index and not index.endswith(b'\n'):
+                # Cut the torn line an interrupted append left behind
+                f.truncate(index.rfind(b'\n') + 1)
+            f.write(json.dumps(entry).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def read_batch(self, room, entry):
+        """Messages of one indexed batch, oldest first"""
+        with open(os.path.join(self.room_dir(room), entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            data = f.read(entry['length'])
+        body = zlib.decompressobj(31).decompress(data).decode('utf-8')
+        return [json.loads(line) for line in body.splitlines()]
+
+    def page(self, room, before=None, limit=100, username=None):
+        """
+        Newest-first page of archived messages older than the before cursor.
+
+        Returns (messages, next cursor or None); raises ValueError for a
+        malformed cursor.
+        """
+        before_key = None
+        if before:
+            timestamp, message_id = decode_cursor(before)
+            before_key = (timestamp.isoformat(timespec='microseconds'), message_id)
+
+        # Batches are in key order unless older messages turned up late,
+        # so go newest batch first and stop once no batch can beat the page
+        entries = [entry for entry in self.entries(room) if not before_key or tuple(entry['first']) < before_key]
+        entries.sort(key=lambda entry: tuple(entry['last']), reverse=True)
+        messages, more = [], False
+        for entry in entries:
+            if len(messages) >= limit:
+                if tuple(entry['last']) < _key(messages[limit - 1]):
+                    more = True
+                    break
+            for record in self.read_batch(room, entry):
+                if before_key and _key(record) >= before_key:
+                    continue
+                if username and record['username'] != username:
+                    continue
+                messages.append(record)
+            messages.sort(key=_key, reverse=True)
+            if len(messages) > limit:
+                more = True
+                del messages[limit:]
+
+        if not more or not messages:
+            return messages, None
+        last = messages[-1]
+        return messages, encode_cursor(datetime.fromisoformat(last['created_at']), last['id'])
+
+
+CHAT_ARCHIVE = ChatArchive()
+
+
+def archive_room(engine, room, cutoff, archive=CHAT_ARCHIVE,
+                 batch_size=CHAT_ARCHIVE_BATCH_SIZE, max_batches=CHAT_ARCHIVE_MAX_BATCHES):
+    """
+    Move a room's messages older than cutoff into the archive, one
+    transaction per batch. Returns how many rows left chat_messages,
+    including ones an earlier run had archived but not deleted.
+    """
+    messages = ChatMessage.__table__
+    in_room = messages.c.room == room
+
+    # Rows archived by a run whose delete did not commit; every batch's
+    # delete commits on its own, so only the newest batches need checking
+    archived = {
+        record['id']
+        for entry in archive.entries(room)[-max_batches:]
+        for record in archive.read_batch(room, entry)
+    }
+
+    moved = 0
+    for _ in range(max_batches):
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(messages).where(in_room, messages.c.created_at < cutoff)
+                .order_by(messages.c.created_at, messages.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            records = [record for record in map(message_record, rows) if record['id'] not in archived]
+            if records:
+                archive.append(room, records)
+            conn.execute(delete(messages).where(messages.c.id.in_([row.id for row in rows])))
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+    return moved
+
+
+def archive_rooms(engine, now, archive=CHAT_ARCHIVE):
+    """Archive up to CHAT_ARCHIVE_MAX_BATCHES batches per room; returns how many messages moved"""
+    messages = ChatMessage.__table__
+    with engine.connect() as conn:
+        rooms = conn.execute(select(distinct(messages.c.room))).scalars().all()
+    moved = 0
+    for room in rooms:
+        days = retention_days(room)
+        if room is None or days <= 0:
+            continue
+        moved += archive_room(engine, room, now - timedelta(days=days), archive)
+    return moved
+
+
+def archive_expired_chat(engine, now):
+    """Scheduler job: move chat messages past their room's retention to the archive"""
+    moved = archive_rooms(engine, now)
+    if moved:
+        print(f"📦 archive_chat: moved {moved} chat messages to {CHAT_ARCHIVE.directory}")
+    # No users changed
+    return []
+
+
+if __name__ == "__main__":
+    from database import get_engine
+    from scheduler import acquire_lease, release_lease
+
+    # The same lease as the scheduled job, so the two never run at once
+    holder = f'{socket.gethostname()}:{os.getpid()}'
+    if not acquire_lease('archive_chat', holder, CHAT_ARCHIVE_INTERVAL):
+        print("⚠️  archive_chat is running in another process; try again later")
+    else:
+        total = 0
+        try:
+            while True:
+                moved = archive_rooms(get_engine(), datetime.utcnow())
+                if not moved:
+                    break
+                total += moved
+                print(f"📦 {total} messages archived...")
+        finally:
+            release_lease('archive_chat', holder)
+        print(f"✨ Chat archive is up to date ({total} messages moved to {CHAT_ARCHIVE.directory})")
@@ -0,0 +1,90 @@
+"""
+Chat broadcasts, optionally coalesced
+
+With CHAT_COALESCE_MS at 0 (the default) every chat message goes out on its
+own as `new_message`. Above 0, messages are collected per room and sent as
+one `new_messages` frame ({room, messages}) CHAT_COALESCE_MS after the
+first of them, or as soon as the room has CHAT_COALESCE_MAX_BATCH waiting.
+CHAT_COALESCE_MAX_MS caps the window, so no message is held back longer
+than that whatever the setting. Fewer frames means fewer encodes and
+socket writes per client when the chat is busy.
+"""
+import os
+import threading
+import time
+
+CHAT_COALESCE_MS = float(os.getenv('CHAT_COALESCE_MS', 0))
+CHAT_COALESCE_MAX_MS = float(os.getenv('CHAT_COALESCE_MAX_MS', 100))
+CHAT_COALESCE_MAX_BATCH = int(os.getenv('CHAT_COALESCE_MAX_BATCH', 100))
+
+
+class _Batch:
+    __slots__ = ('messages', 'due')
+
+    def __init__(self, due):
+        self.messages = []
+        self.due = due
+
+
+class ChatBroadcaster:
+    """Sends chat messages to every client, one by one or in per-room frames"""
+
+    def __init__(self, window_ms=CHAT_COALESCE_MS, max_ms=CHAT_COALESCE_MAX_MS,
+                 max_batch=CHAT_COALESCE_MAX_BATCH):
+        self.window = min(window_ms, max_ms) / 1000
+        self.max_batch = max_batch
+        self.socketio = None
+        self.stats = {'messages': 0, 'frames': 0}
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._flushing = False
+
+    def init_app(self, socketio):
+        self.socketio = socketio
+
+    def publish(self, room, payload):
+        """Broadcast one message now, or queue it for its room's next frame"""
+        self.stats['messages'] += 1
+        if self.window <= 0:
+            self.stats['frames'] += 1
+            self.socketio.emit('new_message', payload)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            batch = self._batches.get(room)
+            if batch is None:
+                batch = self._batches[room] = _Batch(now + self.window)
+            batch.messages.append(payload)
+            full = len(batch.messages) >= self.max_batch
+            if full:
+                del self._batches[room]
+            start = not self._flushing and not full
+            if start:
+                self._flushing = True
+        if full:
+            self._send(room, batch.messages)
+        if start:
+            self.socketio.start_background_task(self._flush_loop)
+
+    def _flush_loop(self):
+        # One flusher per process while anything is pending; exits when idle
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [room for room, batch in self._batches.items() if batch.due <= now]
+                ready = [(room, self._batches.pop(room).messages) for room in due]
+                if not ready and not self._batches:
+                    self._flushing = False
+                    return
+                wake = min((batch.due for batch in self._batches.values()), default=now)
+            for room, messages in ready:
+                self._send(room, messages)
+            self.socketio.sleep(max(0.0, wake - time.monotonic()))
+
+    def _send(self, room, messages):
+        self.stats['frames'] += 1
+        self.socketio.emit('new_messages', {'room': room, 'messages': messages})
+
+
+CHAT_BROADCASTER = ChatBroadcaster()
@@ -0,0 +1,160 @@
+"""
+Chat history paging and catch-up after a reconnect
+
+History is paged newest first with keyset cursors on (created_at, id) over
+the (room, created_at, id) index. A reconnecting client sends the id of the
+last message it saw and gets only the ones after it: from this worker's
+buffer of recent messages when that id is still in it, otherwise from the
+index. The buffer is only kept when every message goes through this
+process (no SOCKETIO_MESSAGE_QUEUE); with several workers it would miss
+the others' messages. It holds the CHAT_BUFFER_ROOMS most recently used
+rooms; room names come from clients, so the socket handlers only accept
+names that fit ChatMessage.room (valid_room).
+"""
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+
+from sqlalchemy import and_, desc, or_
+
+from models import ChatMessage
+from profiles import encode_cursor, decode_cursor
+
+CHAT_PAGE_SIZE = 50
+CHAT_PAGE_MAX = 100
+CHAT_SYNC_MAX = int(os.getenv('CHAT_SYNC_MAX', 200))
+CHAT_BUFFER_SIZE = 0 if os.getenv('SOCKETIO_MESSAGE_QUEUE') else int(os.getenv('CHAT_BUFFER_SIZE', 500))
+CHAT_BUFFER_ROOMS = int(os.getenv('CHAT_BUFFER_ROOMS', 100))
+
+# Fits ChatMessage.room (String(50))
+ROOM_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,50}')
+
+
+def valid_room(room):
+    """Whether a client-supplied room name can be used"""
+    return isinstance(room, str) and ROOM_PATTERN.fullmatch(room) is not None
+
+
+def message_dict(message, user_color=None):
+    """A chat message as sent to clients (the new_message payload)"""
+    return {
+        'id': str(message.id),
+        'username': message.username,
+        'content': message.content,
+        'timestamp': message.created_at.isoformat(),
+        'user_color': user_color
+    }
+
+
+def history_page(session, room, before=None, limit=CHAT_PAGE_SIZE):
+    """
+    One page of a room's history older than the before cursor.
+
+    Returns (messages oldest first, cursor for the page before it or None).
+    Raises ValueError for a malformed cursor.
+    """
+    query = session.query(ChatMessage).filter(ChatMessage.room == room)
+    if before:
+        created_at, message_id = decode_cursor(before)
+        query = query.filter(or_(
+            ChatMessage.created_at < created_at,
+            and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id)
+        ))
+    rows = query.order_by(desc(ChatMessage.created_at), desc(ChatMessage.id)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    rows.reverse()
+    return [message_dict(row) for row in rows], next_cursor
+
+
+def messages_after(session, room, last_id, limit=CHAT_SYNC_MAX):
+    """
+    Up to limit messages of room posted after last_id, oldest first.
+
+    Returns (messages, complete); complete is False when last_id is unknown
+    or more than limit messages were missed, and the client should reload.
+    """
+    last = session.query(ChatMessage.created_at, ChatMessage.id).filter(
+        ChatMessage.id == last_id, ChatMessage.room == room
+    ).first()
+    if last is None:
+        return [], False
+    rows = session.query(ChatMessage).filter(
+        ChatMessage.room == room,
+        or_(
+            ChatMessage.created_at > last.created_at,
+            and_(ChatMessage.created_at == last.created_at, ChatMessage.id > last.id)
+        )
+    ).order_by(ChatMessage.created_at, ChatMessage.id).limit(limit + 1).all()
+    return [message_dict(row) for row in rows[:limit]], len(rows) <= limit
+
+
+class ChatBuffer:
+    """The last CHAT_BUFFER_SIZE messages of the max_rooms most recently used rooms, in broadcast order"""
+
+    def __init__(self, size=CHAT_BUFFER_SIZE, max_rooms=CHAT_BUFFER_ROOMS):
+        self.size = size
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, room, payload):
+        """Record a message just before it is broadcast"""
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is not None:
+                buffer.append(payload)
+                self._rooms.move_to_end(room)
+
+    def after(self, session, room, last_id):
+        """Messages after last_id, or None when last_id is not buffered"""
+        if not self.size or not self.max_rooms:
+            return None
+        if room not in self._rooms:
+            self._seed(session, room)
+        with self._lock:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                # Evicted by other rooms while it was being seeded
+                return None
+            self._rooms.move_to_end(room)
+            buffered = list(buffer)
+        for position in range(len(buffered) - 1, -1, -1):
+            if buffered[position]['id'] == last_id:
+                return buffered[position + 1:]
+        return None
+
+    def _seed(self, session, room):
+        # The buffer exists before the query, so messages committed while
+        # it runs are appended rather than lost; duplicates are dropped
+        with self._lock:
+            if room in self._rooms:
+                return
+            self._rooms[room] = deque(maxlen=self.size)
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        rows, _ = history_page(session, room, limit=self.size)
+        with self._lock:
+            if room not in self._rooms:
+                return
+            appended = list(self._rooms[room])
+            seen = {payload['id'] for payload in appended}
+            self._rooms[room] = deque(
+                [row for row in rows if row['id'] not in seen] + appended,
+                maxlen=self.size
+            )
+
+
+CHAT_BUFFER = ChatBuffer()
+
+
+def missed_messages(session, room, last_id):
+    """(messages after last_id, complete) from the buffer if possible, else the database"""
+    buffered = CHAT_BUFFER.after(session, room, last_id)
+    if buffered is not None and len(buffered) <= CHAT_SYNC_MAX:
+        return buffered, True
+    return messages_after(session, room, last_id)
@@ -0,0 +1,101 @@
+"""
+Gunicorn settings for running skids.rest in production
+
+gunicorn reads this file from the working directory:
+
+    gunicorn 'app_new:create_app()'
+    python start.py --production        (same thing, after the usual checks)
+
+Worker model (GUNICORN_WORKER_CLASS):
+    eventlet  one worker per CPU, each serving up to
+              GUNICORN_WORKER_CONNECTIONS sockets on green threads (default)
+    gthread   2 * CPUs + 1 workers with GUNICORN_THREADS threads each
+
+The app is loaded once in the master (preload_app), and init_db plus the
+idempotent migrations run there before any worker is forked. Workers start
+with fresh database pools. Restarts are graceful:
+
+    kill -HUP  $(cat gunicorn.pid)   new workers, old ones finish their requests
+    kill -USR2 $(cat gunicorn.pid)   new master with new code; then QUIT the old one
+"""
+import multiprocessing
+import os
+
+CPUS = multiprocessing.cpu_count()
+WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'eventlet')
+
+# The eventlet worker monkey-patches itself after fork (patching the master
+# would break its signal handling). Nothing the preloaded app creates at
+# import blocks while holding a lock, and database pools are only built
+# after fork, so they get green locks.
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'eventlet' if WORKER_CLASS == 'eventlet' else 'threading')
+# Workers share their /metrics numbers through files here
+os.environ.setdefault('METRICS_DIR', 'metrics_data')
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+worker_class = WORKER_CLASS
+workers = int(os.getenv('WEB_CONCURRENCY', CPUS if WORKER_CLASS == 'eventlet' else 2 * CPUS + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+if workers > 1 and not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+    # Each worker only knows its own Socket.IO clients; without a shared
+    # queue a chat message would reach a fraction of the room
+    print("⚠️  Set SOCKETIO_MESSAGE_QUEUE (and sticky sessions at the proxy) "
+          "to run several workers; starting 1")
+    workers = 1
+
+preload_app = True
+pidfile = os.getenv('GUNICORN_PIDFILE', 'gunicorn.pid')
+
+# Behind a proxy: idle client connections are cheap for green workers,
+# but hold a slot in a threaded one
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5 if WORKER_CLASS == 'eventlet' else 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle threaded workers now and then; recycling an eventlet worker
+# would drop every websocket it holds
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0 if WORKER_CLASS == 'eventlet' else 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    """Create tables and apply pending migrations once, before the first fork"""
+    from database import db_session, dispose_engines
+    from migrate_compact_ids import migrate
+    from spam_filter import backfill_fingerprints
+
+    result = migrate(vacuum=False, measure=False)
+    if result['converted']:
+        server.log.info("Converted %s to compact ids", ', '.join(result['converted']))
+    filled = backfill_fingerprints(db_session)
+    db_session.remove()
+    if filled:
+        server.log.info("Fingerprinted %d recent pastes for the spam filter", filled)
+    # The master keeps no connections for workers to inherit
+    dispose_engines()
+    # Counters start from zero with each server run
+    import metrics
+    metrics.clear()
+
+
+def post_fork(server, worker):
+    """Give each worker its own database pools"""
+    from database import dispose_engines
+
+    dispose_engines()
+
+
+def worker_exit(server, worker):
+    """Leave the worker's final counts for /metrics"""
+    from metrics import METRICS
+
+    METRICS.flush()
+
+
+def when_ready(server):
+    server.log.info("skids.rest ready: %s x %d on %s", worker_class, workers, bind)
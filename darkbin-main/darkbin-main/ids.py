@@ -0,0 +1,76 @@
+"""
+Compact identifiers
+
+Primary keys are UUIDs kept as strings in Python but stored compactly:
+native uuid (16 bytes) on PostgreSQL, 16 raw bytes elsewhere, instead of
+36 characters of text. Pastes also get a short base62 public id for URLs,
+derived from random bits of their UUID so it needs no extra entropy and
+legacy imports stay deterministic.
+"""
+import uuid
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+# 58 random bits always fit in 10 base62 digits
+SHORT_ID_BITS = 58
+SHORT_ID_LENGTH = 10
+
+
+class GUID(TypeDecorator):
+    """UUID column: native on PostgreSQL, 16 bytes elsewhere, str in Python"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+        return str(value) if dialect.name == 'postgresql' else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'postgresql':
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+def is_uuid(value):
+    """True if value parses as a UUID (dashed or plain hex)"""
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def base62(number, length=0):
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62[remainder])
+    return ''.join(reversed(digits)).rjust(length, BASE62[0])
+
+
+def short_id_for(value):
+    """Short public id for a UUID, from bits that are random in v4 and v5 UUIDs"""
+    tail = uuid.UUID(str(value)).hex[17:]  # skips the version and variant bits
+    return base62(int(tail, 16) >> (len(tail) * 4 - SHORT_ID_BITS), SHORT_ID_LENGTH)
+
+
+def default_short_id(context):
+    """Column default deriving short_id from the row's id"""
+    return short_id_for(context.get_current_parameters()['id'])
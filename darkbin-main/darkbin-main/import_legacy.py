@@ -0,0 +1,221 @@
+"""
+Import the legacy file-based paste store (data/admin, data/other) into the database
+
+Files are streamed with os.scandir and inserted in batches (PostgreSQL COPY
+or executemany). Every file gets a deterministic id, so the import is
+idempotent and can be interrupted and re-run: files that are already in the
+database are skipped without being read again.
+
+    python import_legacy.py --batch-size 2000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database import engine, init_db
+from ids import short_id_for
+from models import Paste
+
+# Namespace for deterministic legacy paste ids
+LEGACY_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://skids.rest/legacy')
+
+# (directory, pinned) pairs, matching app.py's ADMIN_PASTES / ANON_PASTES
+LEGACY_SOURCES = (('admin', True), ('other', False))
+
+COLUMNS = (
+    'id', 'short_id', 'title', 'content', 'language', 'is_public', 'views', 'created_date',
+    'created_by', 'is_deleted', 'is_pinned', 'pinned_by', 'pinned_at'
+)
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Import legacy file pastes')
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), 'data'),
+                        help='Legacy data directory (default: ./data)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--method', choices=('auto', 'copy', 'executemany'), default='auto',
+                        help='Insert strategy; auto uses COPY on PostgreSQL')
+    parser.add_argument('--no-count', action='store_true',
+                        help='Skip the initial pass that counts files for progress/ETA')
+    return parser.parse_args(argv)
+
+
+def legacy_id(kind, name):
+    """Stable paste id for a legacy file"""
+    return str(uuid.uuid5(LEGACY_NAMESPACE, f'{kind}/{name}'))
+
+
+def scan_legacy_files(data_dir):
+    """Yield (kind, pinned, DirEntry) for every regular file, streaming"""
+    for kind, pinned in LEGACY_SOURCES:
+        directory = os.path.join(data_dir, kind)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    yield kind, pinned, entry
+
+
+def count_legacy_files(data_dir):
+    """Number of files the import will visit"""
+    return sum(1 for _ in scan_legacy_files(data_dir))
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def existing_ids(conn, ids):
+    """The subset of ids that are already stored"""
+    rows = conn.execute(select(Paste.id).where(Paste.id.in_(ids)))
+    return {row[0] for row in rows}
+
+
+def build_row(kind, pinned, entry):
+    """Read one legacy file into a pastes row"""
+    stats = entry.stat(follow_symlinks=False)
+    with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+        # PostgreSQL text cannot hold NUL bytes
+        content = f.read().replace('\x00', '')
+    created = datetime.utcfromtimestamp(int(stats.st_mtime))
+    paste_id = legacy_id(kind, entry.name)
+    return {
+        'id': paste_id,
+        'short_id': short_id_for(paste_id),
+        'title': entry.name[:255],
+        'content': content,
+        'language': 'text',
+        'is_public': True,
+        'views': 0,
+        'created_date': created,
+        'created_by': 'admin' if pinned else 'anonymous',
+        'is_deleted': False,
+        'is_pinned': pinned,
+        'pinned_by': 'admin' if pinned else None,
+        'pinned_at': created if pinned else None,
+    }
+
+
+def _csv_field(value):
+    """Encode a value for COPY ... (FORMAT csv); unquoted empty is NULL"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, int):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def insert_copy(conn, rows):
+    """COPY rows into a staging table, then insert the ones that are new"""
+    columns = ', '.join(COLUMNS)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_field(row[c]) for c in COLUMNS))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS legacy_import "
+            "(LIKE pastes INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY legacy_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO pastes ({columns}) SELECT {columns} FROM legacy_import "
+            "ON CONFLICT (id) DO NOTHING"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def insert_executemany(conn, rows):
+    """Batched executemany insert that ignores rows already present"""
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+        return conn.execute(insert(Paste.__table__), rows).rowcount
+    stmt = insert(Paste.__table__).on_conflict_do_nothing(index_elements=['id'])
+    return conn.execute(stmt, rows).rowcount
+
+
+def import_legacy(data_dir, batch_size=1000, method='auto', count=True, out=sys.stdout):
+    """Run the import and return a stats dict"""
+    if method == 'auto':
+        method = 'copy' if engine.dialect.name == 'postgresql' else 'executemany'
+    if method == 'copy' and engine.dialect.name != 'postgresql':
+        raise ValueError('COPY is only available on PostgreSQL')
+    insert_rows = insert_copy if method == 'copy' else insert_executemany
+
+    total = count_legacy_files(data_dir) if count else None
+    stats = {'scanned': 0, 'inserted': 0, 'skipped': 0, 'failed': 0}
+    started = time.monotonic()
+
+    for batch in batched(scan_legacy_files(data_dir), batch_size):
+        with engine.begin() as conn:
+            done = existing_ids(conn, [legacy_id(kind, entry.name) for kind, _, entry in batch])
+            rows = []
+            for kind, pinned, entry in batch:
+                if legacy_id(kind, entry.name) in done:
+                    stats['skipped'] += 1
+                    continue
+                try:
+                    rows.append(build_row(kind, pinned, entry))
+                except OSError as e:
+                    stats['failed'] += 1
+                    print(f"⚠️  Could not read {entry.path}: {e}", file=out)
+            if rows:
+                inserted = insert_rows(conn, rows)
+                stats['inserted'] += inserted if inserted >= 0 else len(rows)
+
+        stats['scanned'] += len(batch)
+        elapsed = time.monotonic() - started
+        rate = stats['scanned'] / elapsed if elapsed else 0
+        progress = f"{stats['scanned']}"
+        if total:
+            eta = (total - stats['scanned']) / rate if rate else 0
+            progress += f"/{total} ({stats['scanned'] * 100 // total}%, ETA {eta:.0f}s)"
+        print(f"📦 {progress} files, {stats['inserted']} inserted, "
+              f"{stats['skipped']} already imported, {rate:.0f} files/s", file=out)
+
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"🚀 Importing legacy pastes from {args.data_dir}...")
+    init_db()
+    result = import_legacy(
+        args.data_dir,
+        batch_size=args.batch_size,
+        method=args.method,
+        count=not args.no_count
+    )
+    print(f"\n✨ Import complete: {result['inserted']} inserted, {result['skipped']} skipped, "
+          f"{result['failed']} failed in {result['seconds']}s")
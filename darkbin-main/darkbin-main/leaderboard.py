@@ -0,0 +1,243 @@
+"""
+Reputation leaderboard
+
+Every worker keeps the users (banned ones left out) in a skip list ordered
+by (-reputation_points, username), whose links know how many entries they
+skip. Moving a user, finding a user's rank and reaching the start of a
+page are O(log n) expected; the top K is the first K entries. Ranks are
+competition ranks: users with equal points share a rank.
+
+The list is loaded from the users table on first use and changed in place
+when reputation changes in this worker (change_reputation) or a user
+registers or is banned. Other workers' changes are picked up by reloading
+every LEADERBOARD_SYNC_SECONDS.
+"""
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import func, update
+
+from models import User
+
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 100))
+LEADERBOARD_PAGE_MAX = 500
+LEADERBOARD_SYNC_SECONDS = int(os.getenv('LEADERBOARD_SYNC_SECONDS', 300))
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, height):
+        self.key = key
+        self.next = [None] * height
+        # Entries from this node to next[level]; only meaningful when next[level] is set
+        self.width = [1] * height
+
+
+class RankedSkipList:
+    """Sorted unique keys with O(log n) insert, remove, rank and index (expected)"""
+
+    MAX_HEIGHT = 24
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_HEIGHT)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build from a list of keys already in order, in O(n)"""
+        skiplist = cls()
+        last = [skiplist.head] * cls.MAX_HEIGHT
+        positions = [0] * cls.MAX_HEIGHT
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, cls._height())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - positions[level]
+                last[level], positions[level] = node, position
+        skiplist.size = len(keys)
+        return skiplist
+
+    @classmethod
+    def _height(cls):
+        height = 1
+        while height < cls.MAX_HEIGHT and random.random() < 0.5:
+            height += 1
+        return height
+
+    def _path(self, key):
+        """The last node before key on every level, and its position"""
+        chain = [None] * self.MAX_HEIGHT
+        positions = [0] * self.MAX_HEIGHT
+        node, position = self.head, 0
+        for level in reversed(range(self.MAX_HEIGHT)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key):
+        chain, positions = self._path(key)
+        height = self._height()
+        node = _Node(key, height)
+        position = positions[0] + 1
+        for level in range(height):
+            before = chain[level]
+            node.next[level] = before.next[level]
+            node.width[level] = positions[level] + before.width[level] + 1 - position
+            before.next[level] = node
+            before.width[level] = position - positions[level]
+        for level in range(height, self.MAX_HEIGHT):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        """Remove key; raises KeyError if it is not there"""
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(self.MAX_HEIGHT):
+            before = chain[level]
+            if before.next[level] is node:
+                before.width[level] += node.width[level] - 1
+                before.next[level] = node.next[level]
+            else:
+                before.width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key):
+        """How many keys are smaller than key"""
+        return self._path(key)[1][0]
+
+    def slice(self, start, stop):
+        """Keys from index start up to stop"""
+        node, position = self.head, 0
+        for level in reversed(range(self.MAX_HEIGHT)):
+            while node.next[level] is not None and position + node.width[level] <= start:
+                position += node.width[level]
+                node = node.next[level]
+        keys = []
+        node = node.next[0]
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Users by reputation for this worker; see the module docstring"""
+
+    def __init__(self, sync_seconds=LEADERBOARD_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._ranks = None
+        self._points = {}
+        self._loaded_at = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def load(self, session):
+        """Rebuild from the users table"""
+        rows = session.query(User.username, User.reputation_points).filter(
+            User.is_banned == False
+        ).all()
+        points = {username: reputation or 0 for username, reputation in rows}
+        ranks = RankedSkipList.from_sorted(sorted((-value, username) for username, value in points.items()))
+        with self._lock:
+            self._ranks, self._points = ranks, points
+            self._loaded_at = time.monotonic()
+            self._loading = False
+
+    def _ensure(self, session):
+        with self._lock:
+            stale = time.monotonic() - self._loaded_at >= self.sync_seconds
+            # While one request reloads, the others keep using the old list
+            reload = self._ranks is None or (stale and not self._loading)
+            if reload:
+                self._loading = True
+        if reload:
+            try:
+                self.load(session)
+            finally:
+                self._loading = False
+
+    def _set(self, username, points, add):
+        with self._lock:
+            # Not loaded yet: the first load reads the committed value
+            if self._ranks is None:
+                return
+            old = self._points.pop(username, None)
+            if old is not None:
+                self._ranks.remove((-old, username))
+            if points is not None and (add or old is not None):
+                self._points[username] = points
+                self._ranks.insert((-points, username))
+
+    def add(self, username, points=0):
+        """Put a (new or unbanned) user on the board"""
+        self._set(username, points, True)
+
+    def move(self, username, points):
+        """New points for a user; users not on the board (banned) stay off"""
+        self._set(username, points, False)
+
+    def discard(self, username):
+        self._set(username, None, False)
+
+    def _rank_of(self, points):
+        # Competition rank: one more than the users with more points ('' sorts first)
+        return self._ranks.rank((-points, '')) + 1
+
+    def top(self, session, limit=LEADERBOARD_SIZE, offset=0):
+        """A page of the board, best first: ([{rank, username, reputation}], total)"""
+        self._ensure(session)
+        with self._lock:
+            keys = self._ranks.slice(offset, offset + limit)
+            entries = []
+            for index, (negative, username) in enumerate(keys):
+                if entries and entries[-1]['reputation'] == -negative:
+                    rank = entries[-1]['rank']
+                elif entries:
+                    rank = offset + index + 1
+                else:
+                    rank = self._rank_of(-negative)
+                entries.append({'rank': rank, 'username': username, 'reputation': -negative})
+            return entries, len(self._ranks)
+
+    def rank(self, session, username):
+        """{rank, username, reputation, total} for a user on the board, else None"""
+        self._ensure(session)
+        with self._lock:
+            points = self._points.get(username)
+            if points is None:
+                return None
+            return {
+                'rank': self._rank_of(points),
+                'username': username,
+                'reputation': points,
+                'total': len(self._ranks)
+            }
+
+
+LEADERBOARD = Leaderboard()
+
+
+def change_reputation(session, username, delta):
+    """
+    Add delta to a user's reputation_points in one UPDATE; returns the new
+    points, or None if there is no such user. Commit, then pass them to
+    LEADERBOARD.move.
+    """
+    return session.execute(
+        update(User)
+        .where(User.username == username)
+        .values(reputation_points=func.coalesce(User.reputation_points, 0) + delta)
+        .returning(User.reputation_points)
+    ).scalar()
@@ -0,0 +1,235 @@
+"""
+Request and Socket.IO metrics in the Prometheus text format
+
+Every Flask request is counted by endpoint, method and status, timed into
+a latency histogram per endpoint and counted in flight while it runs;
+Socket.IO handlers are counted and timed by event name. Requests that
+match no route are recorded as endpoint "unmatched", and methods other than
+the standard ones as "other", so arbitrary paths and methods do not become
+labels.
+
+Recording takes no lock: each OS thread adds into its own shard of plain
+dicts (green threads share their hub's), and shards are only read to take
+a snapshot. With METRICS_DIR set (gunicorn.conf.py sets it), each worker
+writes its snapshot there every METRICS_FLUSH_SECONDS and on exit, and
+/metrics adds up every worker's file - counters of workers that have gone
+stay in the totals, their in-flight gauges do not. Without it, /metrics
+shows this process alone.
+"""
+import glob
+import json
+import os
+import time
+from bisect import bisect_left
+
+from profiler import _native
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Seconds; Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Anything else a client sends is counted as method "other"
+KNOWN_METHODS = frozenset(('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'))
+
+_get_ident = _native('_thread').get_ident
+
+
+class _Shard:
+    """One thread's numbers; only that thread writes to it"""
+
+    __slots__ = ('requests', 'in_flight', 'latency', 'events', 'event_latency')
+
+    def __init__(self):
+        self.requests = {}       # (endpoint, method, status) -> count
+        self.in_flight = {}      # endpoint -> count
+        self.latency = {}        # endpoint -> histogram
+        self.events = {}         # (event, status) -> count
+        self.event_latency = {}  # event -> histogram
+
+
+class Metrics:
+    """This process's metrics, and the exposition of every worker's"""
+
+    def __init__(self, directory=METRICS_DIR, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.buckets = buckets
+        self._shards = {}
+        self._started = False
+        self._file = None
+
+    def _shard(self):
+        ident = _get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            # setdefault is atomic, so a racing thread cannot replace it
+            shard = self._shards.setdefault(ident, _Shard())
+        return shard
+
+    def _observe(self, histograms, key, seconds):
+        # Bucket counts (le each bound, then +Inf), sum, count
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(self.buckets) + 3)
+        values[bisect_left(self.buckets, seconds)] += 1
+        values[-2] += seconds
+        values[-1] += 1
+
+    def begin_request(self, endpoint):
+        """Count a request in flight; returns its start time"""
+        in_flight = self._shard().in_flight
+        endpoint = endpoint or 'unmatched'
+        in_flight[endpoint] = in_flight.get(endpoint, 0) + 1
+        return time.perf_counter()
+
+    def end_request(self, endpoint, method, status, started):
+        seconds = time.perf_counter() - started
+        shard = self._shard()
+        endpoint = endpoint or 'unmatched'
+        shard.in_flight[endpoint] = shard.in_flight.get(endpoint, 0) - 1
+        key = (endpoint, method if method in KNOWN_METHODS else 'other', status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        self._observe(shard.latency, endpoint, seconds)
+
+    def observe_event(self, event, seconds, error=False):
+        """Count and time one Socket.IO handler call"""
+        shard = self._shard()
+        key = (event, 'error' if error else 'ok')
+        shard.events[key] = shard.events.get(key, 0) + 1
+        self._observe(shard.event_latency, event, seconds)
+
+    def snapshot(self):
+        """This process's numbers, summed over threads, as JSON-ready lists"""
+        totals = {name: {} for name in _Shard.__slots__}
+        for shard in list(self._shards.values()):
+            for name in _Shard.__slots__:
+                _add(totals[name], getattr(shard, name))
+        return {
+            name: [[*(key if isinstance(key, tuple) else (key,)), value] for key, value in values.items()]
+            for name, values in totals.items()
+        }
+
+    def flush(self):
+        """Write this worker's snapshot to METRICS_DIR (atomically)"""
+        if not self.directory:
+            return
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Start time in the name: a later process reusing the pid gets its own file
+            self._file = os.path.join(self.directory, f'worker-{os.getpid()}-{time.time_ns()}.json')
+        data = dict(self.snapshot(), pid=os.getpid())
+        tmp = self._file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, self._file)
+
+    def flush_forever(self, sleep=time.sleep):
+        while True:
+            sleep(METRICS_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"❌ Could not write metrics: {e}")
+
+    def start(self, start_background_task, sleep):
+        """Start flushing once per process (only with METRICS_DIR)"""
+        if self._started or not self.directory:
+            return
+        self._started = True
+        start_background_task(self.flush_forever, sleep)
+
+    def collect(self):
+        """Every worker's snapshot added up"""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        totals = {name: {} for name in _Shard.__slots__}
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _alive(data.get('pid'))
+            for name in _Shard.__slots__:
+                if name == 'in_flight' and not alive:
+                    continue
+                _add(totals[name], {tuple(row[:-1]): row[-1] for row in data.get(name, [])})
+        return {name: [[*key, value] for key, value in values.items()] for name, values in totals.items()}
+
+    def render(self):
+        """Prometheus text exposition of collect()"""
+        data = self.collect()
+        lines = []
+        _family(lines, 'http_requests_total', 'counter', 'HTTP requests by endpoint, method and status',
+                [(_labels(endpoint=e, method=m, status=s), v) for e, m, s, v in data['requests']])
+        _family(lines, 'http_requests_in_flight', 'gauge', 'HTTP requests being served',
+                [(_labels(endpoint=e), v) for e, v in data['in_flight']])
+        self._histogram(lines, 'http_request_duration_seconds', 'HTTP request latency by endpoint',
+                        'endpoint', data['latency'])
+        _family(lines, 'socketio_events_total', 'counter', 'Socket.IO events handled, by event and outcome',
+                [(_labels(event=e, status=s), v) for e, s, v in data['events']])
+        self._histogram(lines, 'socketio_event_duration_seconds', 'Socket.IO handler latency by event',
+                        'event', data['event_latency'])
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self, lines, name, help_text, label, rows):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        bounds = [f'{bound:g}' for bound in self.buckets] + ['+Inf']
+        for key, values in sorted((row[0], row[1]) for row in rows):
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(**{label: key, "le": bound})} {cumulative}')
+            lines.append(f'{name}_sum{_labels(**{label: key})} {values[-2]:.6f}')
+            lines.append(f'{name}_count{_labels(**{label: key})} {values[-1]}')
+
+
+def _add(totals, values):
+    # dict(values) copies in one step, so a writer adding a key cannot break the loop
+    for key, value in dict(values).items():
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _family(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in sorted(samples):
+        lines.append(f'{name}{labels} {value}')
+
+
+def clear(directory=METRICS_DIR):
+    """Remove the files of a previous server run"""
+    if not directory:
+        return
+    for path in glob.glob(os.path.join(directory, 'worker-*.json*')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+METRICS = Metrics()
@@ -0,0 +1,237 @@
+"""
+Convert an existing database to compact ids
+
+Databases created before ids.GUID store every primary key (and
+paste_revisions.paste_id) as 36 characters of UUID text and have no
+pastes.short_id. This converts those columns in place - ALTER ... TYPE uuid
+on PostgreSQL, a table rebuild into 16-byte blobs on SQLite - backfills the
+short ids and reports how much smaller the indexes got. Already converted
+tables are left alone, so it is safe to re-run.
+
+    python migrate_compact_ids.py
+"""
+import argparse
+import sys
+import time
+import uuid
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.types import LargeBinary, Uuid
+
+from database import engine, init_db
+from ids import GUID, short_id_for
+from migrate_ticket_notes import move_legacy_notes
+from models import Base, Paste
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Convert UUID text keys to compact ids')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Rows per short id backfill batch')
+    parser.add_argument('--no-vacuum', action='store_true',
+                        help='Skip the final VACUUM on SQLite')
+    return parser.parse_args(argv)
+
+
+def guid_columns(table):
+    return [column.name for column in table.columns if isinstance(column.type, GUID)]
+
+
+def index_sizes(conn):
+    """{table: bytes used by its indexes}, or None when the database cannot tell"""
+    tables = list(Base.metadata.tables)
+    if conn.dialect.name == 'postgresql':
+        rows = conn.execute(text(
+            "SELECT c.relname, COALESCE(SUM(pg_relation_size(i.indexrelid)), 0) "
+            "FROM pg_class c LEFT JOIN pg_index i ON i.indrelid = c.oid "
+            "WHERE c.relkind = 'r' AND c.relname = ANY(:tables) GROUP BY c.relname"
+        ), {'tables': tables})
+    elif conn.dialect.name == 'sqlite':
+        try:
+            rows = conn.execute(text(
+                "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s "
+                "JOIN sqlite_master m ON m.name = s.name "
+                "WHERE m.type = 'index' GROUP BY m.tbl_name"
+            )).all()
+        except OperationalError:
+            # SQLite built without the dbstat virtual table
+            return None
+    else:
+        return None
+    return {name: int(size) for name, size in rows if name in tables}
+
+
+def _uuid_bytes(value):
+    if value is None or isinstance(value, bytes):
+        return value
+    return uuid.UUID(value).bytes
+
+
+def rebuild_sqlite_table(conn, table, existing_columns):
+    """Recreate a SQLite table with the current schema, converting ids on the way"""
+    raw = conn.connection.driver_connection
+    raw.create_function('compact_uuid', 1, _uuid_bytes, deterministic=True)
+    raw.create_function('short_id_for', 1, short_id_for, deterministic=True)
+
+    old = f'{table.name}__old'
+    conn.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {old}')
+    indexes = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (old,)
+    ).scalars().all()
+    for name in indexes:
+        conn.exec_driver_sql(f'DROP INDEX {name}')
+    table.create(conn)
+
+    ids = guid_columns(table)
+    names, values = [], []
+    for column in table.columns:
+        if column.name in existing_columns:
+            names.append(column.name)
+            values.append(f'compact_uuid({column.name})' if column.name in ids else column.name)
+        elif table.name == 'pastes' and column.name == 'short_id':
+            names.append('short_id')
+            values.append('short_id_for(id)')
+    conn.exec_driver_sql(
+        f"INSERT INTO {table.name} ({', '.join(names)}) SELECT {', '.join(values)} FROM {old}"
+    )
+    conn.exec_driver_sql(f'DROP TABLE {old}')
+
+
+def migrate_table(conn, table):
+    """Convert one table if it still uses text ids; True if anything changed"""
+    columns = {column['name']: column['type'] for column in inspect(conn).get_columns(table.name)}
+    stale = [
+        name for name in guid_columns(table)
+        if name in columns and not isinstance(columns[name], (Uuid, LargeBinary))
+    ]
+    missing_short_id = table.name == 'pastes' and 'short_id' not in columns
+    if not stale and not missing_short_id:
+        return False
+
+    if conn.dialect.name == 'sqlite':
+        rebuild_sqlite_table(conn, table, columns)
+    elif conn.dialect.name == 'postgresql':
+        for name in stale:
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ALTER COLUMN {name} TYPE uuid USING {name}::uuid')
+        if missing_short_id:
+            conn.exec_driver_sql('ALTER TABLE pastes ADD COLUMN short_id VARCHAR(10)')
+    else:
+        raise ValueError(f'Compact id migration is not supported on {conn.dialect.name}')
+    return True
+
+
+def add_paste_edit_columns(conn):
+    """Add pastes.revision/edited_at and fill them in for pastes edited before they existed"""
+    inspector = inspect(conn)
+    columns = {column['name'] for column in inspector.get_columns('pastes')}
+    if 'revision' in columns and 'edited_at' in columns:
+        return False
+    if 'revision' not in columns:
+        conn.exec_driver_sql('ALTER TABLE pastes ADD COLUMN revision INTEGER')
+    if 'edited_at' not in columns:
+        conn.exec_driver_sql(f"ALTER TABLE pastes ADD COLUMN edited_at {'TIMESTAMP' if conn.dialect.name == 'postgresql' else 'DATETIME'}")
+    if 'paste_revisions' not in inspector.get_table_names():
+        return True
+    conn.exec_driver_sql(
+        'UPDATE pastes SET '
+        'revision = (SELECT MAX(number) FROM paste_revisions r WHERE r.paste_id = pastes.id), '
+        'edited_at = (SELECT MAX(created_at) FROM paste_revisions r WHERE r.paste_id = pastes.id) '
+        'WHERE EXISTS (SELECT 1 FROM paste_revisions r WHERE r.paste_id = pastes.id)'
+    )
+    return True
+
+
+def backfill_short_ids(batch_size):
+    """Give every paste without one its short id"""
+    pastes = Paste.__table__
+    statement = update(pastes).where(pastes.c.id == bindparam('paste_id')).values(
+        short_id=bindparam('new_short_id')
+    )
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(pastes.c.id).where(pastes.c.short_id.is_(None)).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return filled
+            conn.execute(statement, [{'paste_id': i, 'new_short_id': short_id_for(i)} for i in ids])
+        filled += len(ids)
+
+
+def migrate(batch_size=5000, vacuum=True, measure=True, out=sys.stdout):
+    """Run the migration and return a stats dict (measure=False skips the index sizes)"""
+    started = time.monotonic()
+    existing = set(inspect(engine).get_table_names())
+    before = after = None
+    if measure:
+        with engine.connect() as conn:
+            before = index_sizes(conn)
+
+    # Rebuilt SQLite tables only keep model columns, so save legacy notes first
+    move_legacy_notes(out=out)
+
+    converted = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        with engine.begin() as conn:
+            if migrate_table(conn, table):
+                converted.append(table.name)
+                print(f"🔧 Converted {table.name}", file=out)
+
+    if 'pastes' in existing:
+        with engine.begin() as conn:
+            if add_paste_edit_columns(conn):
+                print("🔧 Added pastes.revision and pastes.edited_at", file=out)
+    filled = backfill_short_ids(batch_size) if 'pastes' in existing else 0
+    # Creates new tables and the short_id index on upgraded ones
+    init_db()
+
+    if vacuum and engine.dialect.name == 'sqlite' and converted:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+
+    if measure:
+        with engine.connect() as conn:
+            after = index_sizes(conn)
+
+    return {
+        'converted': converted,
+        'short_ids_filled': filled,
+        'index_bytes_before': before,
+        'index_bytes_after': after,
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def print_report(result, out=sys.stdout):
+    """Per-table index sizes before and after"""
+    before, after = result['index_bytes_before'], result['index_bytes_after']
+    if before is None or after is None:
+        print("ℹ️  Index sizes are not available on this database", file=out)
+        return
+    print(f"\n{'table':<20}{'before':>12}{'after':>12}{'change':>9}", file=out)
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name, 0), after.get(name, 0)
+        change = f"{(new - old) * 100 / old:+.0f}%" if old else ''
+        print(f"{name:<20}{old // 1024:>10}KB{new // 1024:>10}KB{change:>9}", file=out)
+    total_before, total_after = sum(before.values()), sum(after.values())
+    if total_before:
+        print(f"{'total':<20}{total_before // 1024:>10}KB{total_after // 1024:>10}KB"
+              f"{(total_after - total_before) * 100 / total_before:>+8.0f}%", file=out)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"🚀 Converting {engine.url.render_as_string(hide_password=True)} to compact ids...")
+    result = migrate(batch_size=args.batch_size, vacuum=not args.no_vacuum)
+    print_report(result)
+    if result['converted']:
+        print(f"\n✨ Converted {len(result['converted'])} tables and filled "
+              f"{result['short_ids_filled']} short ids in {result['seconds']}s")
+    else:
+        print("\n✨ Already using compact ids, nothing to do")
@@ -0,0 +1,102 @@
+"""
+Move staff notes out of the legacy support_tickets.notes JSON column
+
+Every entry of a ticket's notes array becomes a ticket_notes row and the
+array is cleared in the same transaction, one batch of tickets at a time,
+so the move can be interrupted and re-run.
+
+    python migrate_ticket_notes.py
+"""
+import argparse
+import json
+import sys
+import uuid
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from database import engine
+from models import TicketNote
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Move JSON ticket notes to ticket_notes')
+    parser.add_argument('--batch-size', type=int, default=500)
+    return parser.parse_args(argv)
+
+
+def _ticket_id(value):
+    """Ticket id as stored (text, uuid or 16 bytes) to its string form"""
+    if isinstance(value, bytes):
+        return str(uuid.UUID(bytes=value))
+    return str(uuid.UUID(str(value)))
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+
+def note_rows(ticket_id, notes):
+    """ticket_notes rows for one legacy notes array"""
+    if isinstance(notes, str):
+        notes = json.loads(notes)
+    rows = []
+    for note in notes if isinstance(notes, list) else []:
+        if isinstance(note, dict):
+            content = note.get('content') or note.get('note') or note.get('text')
+            author = note.get('author') or note.get('by') or note.get('staff')
+            created_at = _timestamp(note.get('created_at') or note.get('timestamp'))
+        else:
+            content, author, created_at = note, None, None
+        if not content:
+            continue
+        rows.append({
+            'id': str(uuid.uuid4()),
+            'ticket_id': ticket_id,
+            'author': str(author or 'unknown')[:50],
+            'content': str(content),
+            'created_at': created_at or datetime.utcnow()
+        })
+    return rows
+
+
+def move_legacy_notes(batch_size=500, out=sys.stdout):
+    """Move every legacy note; returns the number of notes moved"""
+    inspector = inspect(engine)
+    if not inspector.has_table('support_tickets'):
+        return 0
+    if 'notes' not in {column['name'] for column in inspector.get_columns('support_tickets')}:
+        return 0
+    TicketNote.__table__.create(engine, checkfirst=True)
+
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            tickets = conn.execute(text(
+                "SELECT id, notes FROM support_tickets WHERE notes IS NOT NULL LIMIT :limit"
+            ), {'limit': batch_size}).all()
+            if not tickets:
+                break
+            rows = []
+            for stored_id, notes in tickets:
+                rows.extend(note_rows(_ticket_id(stored_id), notes))
+            if rows:
+                conn.execute(TicketNote.__table__.insert(), rows)
+            conn.execute(
+                text("UPDATE support_tickets SET notes = NULL WHERE id = :id"),
+                [{'id': stored_id} for stored_id, _ in tickets]
+            )
+        moved += len(rows)
+    if moved:
+        print(f"📝 Moved {moved} ticket notes to ticket_notes", file=out)
+    return moved
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    moved = move_legacy_notes(batch_size=args.batch_size)
+    print(f"✨ {moved} notes moved")
@@ -2,10 +2,11 @@
 Database models for skids.rest
 """
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, Text, JSON, ForeignKey, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from flask_login import UserMixin
-import uuid
+
+from ids import GUID, new_id, default_short_id
 
 Base = declarative_base()
 
@@ -14,7 +15,7 @@ class User(Base, UserMixin):
     __tablename__ = 'users'
     
     # Primary fields
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     username = Column(String(50), unique=True, nullable=False, index=True)
     password = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, nullable=True, index=True)
@@ -43,13 +44,13 @@ class User(Base, UserMixin):
     tier_status = Column(String(20), default='none')  # none, active, past_due, canceled
     stripe_customer_id = Column(String(255), nullable=True)
     stripe_subscription_id = Column(String(255), nullable=True)
-    premium_expires_at = Column(DateTime, nullable=True)
+    premium_expires_at = Column(DateTime, nullable=True, index=True)
     
     # Moderation
     is_banned = Column(Boolean, default=False)
     is_suspended = Column(Boolean, default=False)
-    banned_until = Column(DateTime, nullable=True)
-    suspended_until = Column(DateTime, nullable=True)
+    banned_until = Column(DateTime, nullable=True, index=True)
+    suspended_until = Column(DateTime, nullable=True, index=True)
     ban_reason = Column(Text, nullable=True)
     suspension_reason = Column(Text, nullable=True)
     banned_by = Column(String(50), nullable=True)
@@ -63,8 +64,12 @@ class User(Base, UserMixin):
 
 class Paste(Base):
     __tablename__ = 'pastes'
+    __table_args__ = (
+        Index('ix_pastes_created_by_date', 'created_by', 'created_date', 'id'),  # profile listings
+    )
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
+    short_id = Column(String(10), unique=True, index=True, default=default_short_id)  # public id for URLs
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
     language = Column(String(50), default='text')
@@ -90,12 +95,50 @@ class Paste(Base):
     is_pinned = Column(Boolean, default=False)
     pinned_by = Column(String(50), nullable=True)
     pinned_at = Column(DateTime, nullable=True)
+    
+    # Edits: current revision number (1 until the first edit), for ETags and page caches
+    revision = Column(Integer, default=1)
+    edited_at = Column(DateTime, nullable=True)
+
+
+class PasteRevision(Base):
+    __tablename__ = 'paste_revisions'
+    __table_args__ = (
+        UniqueConstraint('paste_id', 'number', name='uq_paste_revision_number'),
+    )
+    
+    id = Column(GUID, primary_key=True, default=new_id)
+    paste_id = Column(GUID, nullable=False)
+    number = Column(Integer, nullable=False)  # 1 = original content
+    
+    # Storage: zlib-compressed full text (snapshot) or line delta against number - 1
+    is_snapshot = Column(Boolean, default=False)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, default=0)  # uncompressed content length
+    content_hash = Column(String(64), nullable=False)  # sha256 of the full content
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    created_by = Column(String(50), nullable=True)
+
+
+class PasteFingerprint(Base):
+    __tablename__ = 'paste_fingerprints'
+    
+    paste_id = Column(GUID, primary_key=True)
+    content_hash = Column(BigInteger, nullable=False)  # first 64 bits of the sha256
+    simhash = Column(BigInteger, nullable=True)  # None when the paste is too short to compare
+    created_by = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class Comment(Base):
     __tablename__ = 'comments'
+    __table_args__ = (
+        Index('ix_comments_profile_user_date', 'profile_user', 'created_at', 'id'),  # profile comments
+    )
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String(50), nullable=False)  # username
@@ -104,8 +147,15 @@ class Comment(Base):
 
 class SupportTicket(Base):
     __tablename__ = 'support_tickets'
-    
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Staff queue: oldest first within a status / priority / assignee
+        Index('ix_support_tickets_status', 'status', 'created_at', 'id'),
+        Index('ix_support_tickets_status_priority', 'status', 'priority', 'created_at', 'id'),
+        Index('ix_support_tickets_assignee', 'assigned_to', 'status', 'created_at', 'id'),
+        Index('ix_support_tickets_user', 'user_id', 'created_at'),
+    )
+    
+    id = Column(GUID, primary_key=True, default=new_id)
     user_id = Column(String(50), nullable=True)  # username or null for guest
     email = Column(String(255), nullable=True)
     subject = Column(String(255), nullable=False)
@@ -118,18 +168,33 @@ class SupportTicket(Base):
     # Assignment
     assigned_to = Column(String(50), nullable=True)  # staff username
     
-    # Notes (JSON array)
-    notes = Column(JSON, default=list)
-    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class TicketNote(Base):
+    __tablename__ = 'ticket_notes'
+    __table_args__ = (
+        Index('ix_ticket_notes_ticket', 'ticket_id', 'created_at'),
+    )
+    
+    # Append-only: staff notes are never edited in place
+    id = Column(GUID, primary_key=True, default=new_id)
+    ticket_id = Column(GUID, nullable=False)
+    author = Column(String(50), nullable=False)  # staff username
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ChatMessage(Base):
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        # History pages and reconnect catch-up are keyset scans per room
+        Index('ix_chat_messages_room_date', 'room', 'created_at', 'id'),
+    )
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     user_id = Column(String(50), nullable=False)  # username
     username = Column(String(50), nullable=False)
     content = Column(Text, nullable=False)
@@ -140,11 +205,21 @@ class ChatMessage(Base):
 class SecurityLog(Base):
     __tablename__ = 'security_logs'
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     action = Column(String(50), nullable=False)  # login, register, paste_create, etc.
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     user_id = Column(String(50), nullable=True)
     success = Column(Boolean, default=True)
-    additional_data = Column(JSON, nullable=True)
\ No newline at end of file
+    additional_data = Column(JSON, nullable=True)
+
+
+class SchedulerLease(Base):
+    __tablename__ = 'scheduler_leases'
+    
+    # One row per background job; whoever holds an unexpired lease runs it
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100), nullable=False)  # host:pid
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
\ No newline at end of file
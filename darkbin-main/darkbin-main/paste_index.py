@@ -0,0 +1,196 @@
+"""
+Incremental index of a legacy paste directory (data/admin, data/other)
+
+The index keeps one entry per file, ordered newest first, and only looks at
+what changed: inotify events where the kernel supports them, otherwise a
+directory mtime check followed by a scandir diff. Listing a page is
+O(page size).
+"""
+import bisect
+import ctypes
+import ctypes.util
+import os
+import stat
+import struct
+import threading
+import time
+from datetime import datetime
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+# Directory mtimes this close to "now" may hide a second change in the same tick
+MTIME_GRACE_SECONDS = 2
+
+
+def _load_libc():
+    """libc with inotify support, or None"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+
+class _InotifyWatch:
+    """Non-blocking inotify watch on a single directory"""
+
+    def __init__(self, path):
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {path}')
+
+    def read_events(self):
+        """Drain pending events as (mask, name) pairs"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryIndex:
+    """Newest-first index of the regular files in one directory"""
+
+    def __init__(self, path, use_inotify=True):
+        self.path = path
+        self._entries = {}      # name -> listing dict
+        self._keys = {}         # name -> sort key
+        self._order = []        # sorted (-mtime, name) keys
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._watch = None
+        if use_inotify and _libc is not None:
+            try:
+                self._watch = _InotifyWatch(path)
+            except OSError:
+                self._watch = None
+        self._rescan()
+
+    @property
+    def uses_inotify(self):
+        return self._watch is not None
+
+    def __len__(self):
+        return len(self._order)
+
+    def refresh(self):
+        """Bring the index up to date with the directory"""
+        with self._lock:
+            if self._watch is not None:
+                self._apply_events(self._watch.read_events())
+                return
+            try:
+                dir_mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                dir_mtime = None
+            recent = dir_mtime is not None and time.time() - dir_mtime / 1e9 < MTIME_GRACE_SECONDS
+            if dir_mtime != self._dir_mtime or recent:
+                self._rescan()
+
+    def page(self, offset=0, limit=None):
+        """Listing dicts for one page, newest first"""
+        with self._lock:
+            end = None if limit is None else offset + limit
+            return [self._entries[name] for _, name in self._order[offset:end]]
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
+
+    def _apply_events(self, events):
+        for mask, name in events:
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                # Lost events or the directory itself went away: fall back to a full diff
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    self._watch.close()
+                    self._watch = None
+                self._rescan()
+                return
+            if not name:
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._remove(name)
+            else:
+                self._update(name)
+
+    def _rescan(self):
+        """Diff the directory against the index; only new names are stat'ed"""
+        try:
+            self._dir_mtime = os.stat(self.path).st_mtime_ns
+            with os.scandir(self.path) as entries:
+                present = {entry.name for entry in entries if entry.is_file(follow_symlinks=False)}
+        except FileNotFoundError:
+            present = set()
+        for name in list(self._entries):
+            if name not in present:
+                self._remove(name)
+        for name in present:
+            if name not in self._entries:
+                self._update(name)
+
+    def _update(self, name):
+        try:
+            stats = os.stat(os.path.join(self.path, name))
+        except FileNotFoundError:
+            stats = None
+        if stats is None or not stat.S_ISREG(stats.st_mode):
+            self._remove(name)
+            return
+        self._remove(name)
+        created = datetime.utcfromtimestamp(int(stats.st_mtime))
+        self._entries[name] = {
+            "name": name,
+            "size": stats.st_size / 1000,
+            "creation_date": created.strftime('%d-%m-%Y'),
+            "creation_time": created.strftime('%H:%M:%S')
+        }
+        self._keys[name] = (-stats.st_mtime, name)
+        bisect.insort(self._order, self._keys[name])
+
+    def _remove(self, name):
+        self._entries.pop(name, None)
+        key = self._keys.pop(name, None)
+        if key is None:
+            return
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
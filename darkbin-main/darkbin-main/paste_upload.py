@@ -0,0 +1,247 @@
+"""
+Streaming paste uploads
+
+The new-paste form body is parsed straight from the request stream in
+chunks instead of through request.form. pasteContent is stripped, size
+checked, hashed and compressed as it arrives and spooled to a temporary
+file, so a worker never holds more than one chunk of an oversized body and
+at most one copy of an accepted one.
+"""
+import codecs
+import hashlib
+import os
+import tempfile
+import zlib
+from urllib.parse import unquote_to_bytes
+
+CHUNK_SIZE = 64 * 1024
+
+# Spooled uploads stay in memory up to this many compressed bytes
+SPOOL_MEMORY_BYTES = int(os.getenv('PASTE_SPOOL_MEMORY_BYTES', 1024 * 1024))
+
+# Maximum paste size in bytes, per User.tier ('anonymous' for logged-out posters)
+PASTE_SIZE_LIMITS = {
+    'anonymous': int(os.getenv('PASTE_LIMIT_ANONYMOUS', 1024 * 1024)),
+    'free': int(os.getenv('PASTE_LIMIT_FREE', 4 * 1024 * 1024)),
+    'premium': int(os.getenv('PASTE_LIMIT_PREMIUM', 32 * 1024 * 1024)),
+}
+
+# Small form fields (title etc.) are capped separately
+MAX_FIELD_BYTES = 4096
+
+# Bytes str.strip() would remove from either end of ASCII text
+WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+class PasteTooLarge(Exception):
+    """Raised when an upload exceeds the poster's size limit"""
+
+    def __init__(self, limit):
+        super().__init__(f'Paste exceeds the {limit} byte limit')
+        self.limit = limit
+
+
+def paste_size_limit(user):
+    """Size limit for a user (or anonymous when not authenticated)"""
+    if user is None or not user.is_authenticated:
+        return PASTE_SIZE_LIMITS['anonymous']
+    return PASTE_SIZE_LIMITS.get(user.tier, PASTE_SIZE_LIMITS['free'])
+
+
+def max_request_size():
+    """Largest request body any tier can send, allowing for percent-encoding"""
+    return max(PASTE_SIZE_LIMITS.values()) * 3 + 64 * 1024
+
+
+class SpooledContent:
+    """Stripped paste content, hashed and compressed into a spooled temp file"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._compressor = zlib.compressobj(1)
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        self._leading = True
+        self._pending_whitespace = bytearray()
+
+    def write(self, data):
+        # Strip leading whitespace; hold trailing whitespace back until more text follows
+        if self._leading:
+            data = data.lstrip(WHITESPACE)
+            if not data:
+                return
+            self._leading = False
+        body = data.rstrip(WHITESPACE)
+        if body:
+            if self._pending_whitespace:
+                self._emit(bytes(self._pending_whitespace))
+                self._pending_whitespace.clear()
+            self._emit(body)
+        self._pending_whitespace += data[len(body):]
+        if self.size + len(self._pending_whitespace) > self.limit:
+            raise PasteTooLarge(self.limit)
+
+    def _emit(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise PasteTooLarge(self.limit)
+        self._sha256.update(data)
+        self._spool.write(self._compressor.compress(data))
+
+    def finish(self):
+        """Flush the compressor; trailing whitespace is dropped"""
+        self._pending_whitespace.clear()
+        self._spool.write(self._compressor.flush())
+        self._spool.seek(0)
+
+    @property
+    def digest(self):
+        return self._sha256.hexdigest()
+
+    def read_text(self):
+        """Decompress and decode the content"""
+        self._spool.seek(0)
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parts = []
+        while True:
+            chunk = self._spool.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decoder.decode(decompressor.decompress(chunk)))
+        parts.append(decoder.decode(decompressor.flush(), final=True))
+        return ''.join(parts)
+
+    def close(self):
+        self._spool.close()
+
+
+class _FieldBuffer:
+    """Sink for small form fields"""
+
+    def __init__(self):
+        self.value = bytearray()
+
+    def write(self, data):
+        self.value += data
+        if len(self.value) > MAX_FIELD_BYTES:
+            del self.value[MAX_FIELD_BYTES:]
+
+
+class PasteUpload:
+    """Fields of a parsed new-paste form"""
+
+    def __init__(self, fields, content):
+        self.fields = fields
+        self.content = content
+
+    def get(self, name, default=None):
+        value = self.fields.get(name)
+        return default if value is None else value
+
+    def close(self):
+        self.content.close()
+
+
+def _decode(segment):
+    return unquote_to_bytes(segment.replace(b'+', b' '))
+
+
+def parse_urlencoded_stream(stream, content_field, content_sink, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally parse an application/x-www-form-urlencoded body.
+
+    The value of content_field is decoded into content_sink chunk by chunk;
+    other fields are returned as a dict of (capped) strings.
+    """
+    fields = {}
+    key = bytearray()
+    sink = None           # None while reading a key
+    carry = b''
+
+    def finish_field():
+        name = _decode(bytes(key)).decode('utf-8', 'replace')
+        if isinstance(sink, _FieldBuffer):
+            fields[name] = bytes(sink.value).decode('utf-8', 'replace')
+        elif sink is None and name:
+            fields[name] = ''
+
+    while True:
+        chunk = stream.read(chunk_size)
+        data = carry + chunk if chunk else carry
+        carry = b''
+        if chunk:
+            # Never split a %XX escape across two decode calls
+            tail = data.rfind(b'%', max(0, len(data) - 2))
+            if tail != -1:
+                data, carry = data[:tail], data[tail:]
+
+        position = 0
+        while position < len(data):
+            if sink is None:
+                end = len(data)
+                for separator in (b'=', b'&'):
+                    found = data.find(separator, position)
+                    if found != -1:
+                        end = min(end, found)
+                key += data[position:end]
+                if len(key) > MAX_FIELD_BYTES:
+                    del key[MAX_FIELD_BYTES:]
+                if end == len(data):
+                    position = end
+                elif data[end:end + 1] == b'=':
+                    name = _decode(bytes(key)).decode('utf-8', 'replace')
+                    sink = content_sink if name == content_field else _FieldBuffer()
+                    position = end + 1
+                else:
+                    finish_field()
+                    key.clear()
+                    position = end + 1
+            else:
+                end = data.find(b'&', position)
+                segment = data[position:] if end == -1 else data[position:end]
+                if segment:
+                    sink.write(_decode(segment))
+                if end == -1:
+                    position = len(data)
+                else:
+                    finish_field()
+                    key.clear()
+                    sink = None
+                    position = end + 1
+
+        if not chunk:
+            break
+
+    if key or sink is not None:
+        finish_field()
+    return fields
+
+
+def read_paste_upload(request, limit, content_field='pasteContent'):
+    """Parse the new-paste form from the request stream within a size limit"""
+    content = SpooledContent(limit)
+    try:
+        if request.mimetype == 'application/x-www-form-urlencoded':
+            fields = parse_urlencoded_stream(request.stream, content_field, content)
+        else:
+            # multipart and others: werkzeug already spools file parts to disk
+            fields = {k: v for k, v in request.form.items() if k != content_field}
+            value = request.form.get(content_field)
+            if value is None and content_field in request.files:
+                file = request.files[content_field]
+                while True:
+                    chunk = file.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    content.write(chunk)
+            elif value:
+                encoded = value.encode('utf-8')
+                for i in range(0, len(encoded), CHUNK_SIZE):
+                    content.write(encoded[i:i + CHUNK_SIZE])
+        content.finish()
+    except Exception:
+        content.close()
+        raise
+    return PasteUpload(fields, content)
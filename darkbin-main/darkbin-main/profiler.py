@@ -0,0 +1,305 @@
+"""
+On-demand sampling profiler for live requests and Socket.IO events
+
+Admins switch it on for a single request (?_profile=1 or an X-Profile
+header), a single Socket.IO event ("_profile": 1 in its data), or every
+request and event of one target (route endpoint or handler name) for a
+window of time. While anything is being profiled, a native thread samples
+the stacks of the threads serving it every PROFILER_INTERVAL_MS. Each sample
+goes to the capture whose anchor frame is on that stack, so other requests
+and greenlets sharing the thread are left out. Under eventlet a greenlet is
+only sampled while it runs, so time spent waiting on I/O does not show up.
+
+Each request or window is written to PROFILER_DIR as collapsed stacks
+(flamegraph.pl, speedscope, ...) or as speedscope JSON ("=speedscope").
+When nothing is profiled, the cost is one dict lookup per request.
+"""
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILER_DIR = os.getenv('PROFILER_DIR', 'profiler_output')
+PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 1))
+PROFILER_MAX_SECONDS = int(os.getenv('PROFILER_MAX_SECONDS', 600))
+
+FORMATS = ('collapsed', 'speedscope')
+
+
+def _native(name):
+    """The stdlib module `name`, unpatched even when eventlet has monkey-patched it"""
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return patcher.original(name)
+    return __import__(name)
+
+
+def profile_format(flag):
+    """Output format asked for by a ?_profile= / X-Profile value, or None"""
+    if flag in (None, '', '0', 'false', False):
+        return None
+    return flag if flag in FORMATS else 'collapsed'
+
+
+def find_frame(code):
+    """The innermost frame on the current stack running `code`"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code is not code:
+        frame = frame.f_back
+    return frame
+
+
+class Capture:
+    """Stack samples for one request/event or one window"""
+
+    def __init__(self, target, fmt, until=None):
+        self.target = target
+        self.format = fmt
+        self.until = until
+        self.started = time.time()
+        self.samples = Counter()
+        self.calls = 0
+
+
+class Profiler:
+    """Registry of running captures plus the sampler thread that feeds them"""
+
+    def __init__(self, directory=PROFILER_DIR, interval_ms=PROFILER_INTERVAL_MS):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self._windows = {}
+        self._windows_mtime = None
+        self._refresh_at = 0
+        self._running = {}
+        self._labels = {}
+        # Shared with the native sampler thread, so never a green lock
+        self._lock = _native('threading').Lock()
+        self._sampling = False
+        self._switch_interval = None
+
+    def watching(self, target):
+        """True while a window is open for target"""
+        if time.monotonic() >= self._refresh_at:
+            self._refresh()
+        return target in self._windows
+
+    # ------------------------------------------------------------------ windows
+    #
+    # Open windows live in PROFILER_DIR/windows.json so that every worker
+    # process sees them; each worker re-reads it at most once a second and
+    # writes its own file per window when the window closes.
+
+    @property
+    def _windows_file(self):
+        return os.path.join(self.directory, 'windows.json')
+
+    def _read_windows(self):
+        try:
+            with open(self._windows_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_windows(self, windows):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{self._windows_file}.{os.getpid()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(windows, f)
+        os.replace(tmp, self._windows_file)
+
+    def _refresh(self):
+        """Sync this worker's window captures with windows.json; write the closed ones"""
+        self._refresh_at = time.monotonic() + 1
+        try:
+            mtime = os.stat(self._windows_file).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._windows_mtime:
+            self._windows_mtime = mtime
+            wanted = self._read_windows() if mtime else {}
+        else:
+            wanted = {target: {'until': c.until, 'format': c.format} for target, c in self._windows.items()}
+
+        now = time.time()
+        closed = []
+        with self._lock:
+            for target, capture in list(self._windows.items()):
+                if target not in wanted or capture.until <= now:
+                    closed.append(self._windows.pop(target))
+            for target, window in wanted.items():
+                if window['until'] <= now:
+                    continue
+                capture = self._windows.get(target)
+                if capture is None:
+                    capture = self._windows[target] = Capture(target, window['format'])
+                capture.until = window['until']
+        return [name for name in map(self._write, closed) if name]
+
+    def start_window(self, target, seconds, fmt='collapsed'):
+        """Profile every request/event of target, in every worker, for the next `seconds`"""
+        seconds = min(max(int(seconds), 1), PROFILER_MAX_SECONDS)
+        windows = self._read_windows()
+        windows = {name: window for name, window in windows.items() if window['until'] > time.time()}
+        windows[target] = {'until': time.time() + seconds, 'format': fmt}
+        self._save_windows(windows)
+        self._refresh()
+
+    def stop_window(self, target):
+        """Close a window now; returns the files this worker wrote for it"""
+        windows = self._read_windows()
+        windows.pop(target, None)
+        self._save_windows(windows)
+        return self._refresh()
+
+    def windows(self):
+        """Open windows with this worker's call and sample counts"""
+        self._refresh()
+        with self._lock:
+            open_windows = list(self._windows.values())
+        return [{
+            'target': capture.target,
+            'format': capture.format,
+            'seconds_left': round(capture.until - time.time(), 1),
+            'calls': capture.calls,
+            'samples': sum(capture.samples.values())
+        } for capture in open_windows]
+
+    def files(self, limit=50):
+        """Newest output files"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory) if not name.startswith('windows.json')]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)), reverse=True)
+        return names[:limit]
+
+    # ---------------------------------------------------------------- captures
+
+    def begin(self, target, anchor, fmt=None):
+        """
+        Start sampling the caller for target, anchored at frame `anchor`.
+
+        fmt asks for a capture of just this call; without it the call joins
+        target's open window, if any. Returns a token for end(), or None.
+        """
+        if fmt:
+            capture = Capture(target, fmt)
+        else:
+            capture = self._windows.get(target)
+            if capture is None or capture.until <= time.time():
+                return None
+        capture.calls += 1
+        token = (_native('_thread').get_ident(), anchor, capture)
+        with self._lock:
+            self._running[id(token)] = token
+            if not self._sampling:
+                self._sampling = True
+                self._start_sampler()
+        return token
+
+    def end(self, token):
+        """Stop sampling a call; returns the file written for a single-call capture"""
+        if token is None:
+            return None
+        with self._lock:
+            self._running.pop(id(token), None)
+        capture = token[2]
+        if capture.until is None:
+            return self._write(capture)
+        return None
+
+    # ---------------------------------------------------------------- sampling
+
+    def _start_sampler(self):
+        # Shorter GIL switch interval so the sampler gets in on time
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+        _native('threading').Thread(target=self._sample_loop, name='profiler', daemon=True).start()
+
+    def _sample_loop(self):
+        sleep = _native('time').sleep
+        while True:
+            with self._lock:
+                running = list(self._running.values())
+                if not running:
+                    self._sampling = False
+                    sys.setswitchinterval(self._switch_interval)
+                    return
+            frames = sys._current_frames()
+            for thread_id, anchor, capture in running:
+                stack = self._stack(frames.get(thread_id), anchor)
+                if stack:
+                    capture.samples[stack] += 1
+            sleep(self.interval)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+        return label
+
+    def _stack(self, frame, anchor):
+        """Root-first labels from anchor down to frame, or None if anchor is not on the stack"""
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            if frame is anchor:
+                return tuple(self._label(code) for code in reversed(codes))
+            frame = frame.f_back
+        return None
+
+    # ------------------------------------------------------------------ output
+
+    def _write(self, capture):
+        if not capture.samples:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcfromtimestamp(capture.started).strftime('%Y%m%d-%H%M%S-%f')
+        # Targets are endpoint and handler names; keep the filename to safe characters anyway
+        slug = re.sub(r'[^A-Za-z0-9_-]', '_', capture.target)[:80]
+        name = f'{slug}-{stamp}-{os.getpid()}'
+        if capture.format == 'speedscope':
+            name += '.speedscope.json'
+            body = json.dumps(self._speedscope(capture))
+        else:
+            name += '.collapsed'
+            body = ''.join(f"{';'.join(stack)} {count}\n" for stack, count in capture.samples.most_common())
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(body)
+        return name
+
+    def _speedscope(self, capture):
+        """Sampled profile in speedscope's file format"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in capture.samples.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({'name': label})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count)
+        total = sum(weights)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': f'{capture.target} ({capture.calls} calls)',
+                'unit': 'none',
+                'startValue': 0,
+                'endValue': total,
+                'samples': samples,
+                'weights': weights
+            }],
+            'name': capture.target,
+            'exporter': 'skids.rest profiler'
+        }
+
+
+PROFILER = Profiler()
@@ -0,0 +1,144 @@
+"""
+Cached profile pages
+
+A profile view is the user plus their newest public pastes and profile
+comments. It is built once as plain dicts and cached per username until
+something on the page changes (invalidate_profile) or PROFILE_CACHE_TTL
+passes; the TTL bounds how stale another worker's copy can get. Older
+pastes and comments are paged with keyset cursors on (timestamp, id).
+"""
+import base64
+import os
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, desc, or_
+
+from cache import ByteLRU
+from ids import is_uuid
+from models import Comment, Paste, User
+
+PROFILE_PASTES = 10
+PROFILE_COMMENTS = 20
+PROFILE_PAGE_MAX = 100
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 60))
+
+PROFILE_CACHE = ByteLRU(int(os.getenv('PROFILE_CACHE_BYTES', 16 * 1024 * 1024)))
+
+# User columns shown on a profile
+PROFILE_FIELDS = (
+    'username', 'role', 'bio', 'profile_image', 'banner_url', 'username_color',
+    'paste_count', 'comment_count', 'reputation_points', 'follower_count',
+    'following_count', 'joined_date', 'tier', 'is_banned', 'is_suspended', 'is_featured'
+)
+
+PASTE_COLUMNS = (Paste.id, Paste.short_id, Paste.title, Paste.language, Paste.views, Paste.created_date)
+COMMENT_COLUMNS = (Comment.id, Comment.content, Comment.created_by, Comment.created_at)
+
+
+def encode_cursor(timestamp, item_id):
+    """Opaque cursor pointing just past (timestamp, id)"""
+    raw = f'{timestamp.isoformat()}|{item_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a cursor; raises ValueError (only) when malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, item_id = raw.split('|', 1)
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError, base64.binascii.Error) as e:
+        raise ValueError('Invalid cursor') from e
+    # The id half is bound against uuid columns
+    if not is_uuid(item_id):
+        raise ValueError('Invalid cursor')
+    return timestamp, str(uuid.UUID(item_id))
+
+
+def _keyset(query, timestamp_column, id_column, before, limit):
+    """Newest-first page of query strictly older than the before cursor"""
+    if before:
+        timestamp, item_id = decode_cursor(before)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < item_id)
+        ))
+    rows = query.order_by(desc(timestamp_column), desc(id_column)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def paste_page(session, username, before=None, limit=PROFILE_PASTES):
+    """A user's public pastes, newest first, and the cursor for the next page"""
+    query = session.query(*PASTE_COLUMNS).filter(
+        Paste.created_by == username,
+        Paste.is_public == True,
+        Paste.is_deleted == False
+    )
+    rows, next_cursor = _keyset(query, Paste.created_date, Paste.id, before, limit)
+    return [{
+        'id': row.id,
+        'short_id': row.short_id,
+        'title': row.title,
+        'language': row.language,
+        'views': row.views,
+        'created_date': row.created_date
+    } for row in rows], next_cursor
+
+
+def comment_page(session, username, before=None, limit=PROFILE_COMMENTS):
+    """Comments on a user's profile, newest first, and the cursor for the next page"""
+    query = session.query(*COMMENT_COLUMNS).filter(Comment.profile_user == username)
+    rows, next_cursor = _keyset(query, Comment.created_at, Comment.id, before, limit)
+    return [{
+        'id': row.id,
+        'content': row.content,
+        'created_by': row.created_by,
+        'created_at': row.created_at
+    } for row in rows], next_cursor
+
+
+def _model_size(model):
+    """Rough byte size of a view model, for the cache budget"""
+    size = 256
+    for item in [model['user']] + model['user_pastes'] + model['comments']:
+        size += 64 + sum(len(value) for value in item.values() if isinstance(value, str))
+    return size
+
+
+def profile_view(session, username):
+    """Cached view model for a profile page, or None if the user does not exist"""
+    cached = PROFILE_CACHE.get(username)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    user = session.query(*(getattr(User, field) for field in PROFILE_FIELDS)).filter(
+        User.username == username
+    ).first()
+    if user is None:
+        return None
+
+    user_pastes, next_pastes = paste_page(session, username)
+    comments, next_comments = comment_page(session, username)
+    model = {
+        'user': {field: getattr(user, field) for field in PROFILE_FIELDS},
+        'user_pastes': user_pastes,
+        'comments': comments,
+        'next_pastes': next_pastes,
+        'next_comments': next_comments
+    }
+    PROFILE_CACHE.put(username, (time.monotonic() + PROFILE_CACHE_TTL, model), size=_model_size(model))
+    return model
+
+
+def invalidate_profile(*usernames):
+    """Drop cached profiles after anything shown on them changes"""
+    for username in usernames:
+        if username:
+            PROFILE_CACHE.discard(username)
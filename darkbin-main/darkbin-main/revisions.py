@@ -0,0 +1,168 @@
+"""
+Paste revision history with delta-compressed storage
+
+Paste.content always holds the latest revision, so the common read path
+never touches this module. Older revisions live in paste_revisions: each
+one is a zlib-compressed line delta against its parent, except for a full
+snapshot every SNAPSHOT_INTERVAL revisions (and whenever a delta would not
+be smaller), so rebuilding any revision applies at most
+SNAPSHOT_INTERVAL - 1 deltas.
+"""
+import difflib
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+
+from sqlalchemy import desc, func
+
+from models import PasteRevision
+
+SNAPSHOT_INTERVAL = int(os.getenv('PASTE_SNAPSHOT_INTERVAL', 10))
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def make_delta(parent, child):
+    """Line delta turning parent into child: ['c', start, end] copies, ['i', text] inserts"""
+    parent_lines = parent.splitlines(keepends=True)
+    child_lines = child.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, parent_lines, child_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            if ops and ops[-1][0] == 'c' and ops[-1][2] == i1:
+                ops[-1][2] = i2
+            else:
+                ops.append(['c', i1, i2])
+        elif j2 > j1:
+            text = ''.join(child_lines[j1:j2])
+            if ops and ops[-1][0] == 'i':
+                ops[-1][1] += text
+            else:
+                ops.append(['i', text])
+    return ops
+
+
+def apply_delta(parent, ops):
+    """Rebuild a child revision from its parent and a delta"""
+    parent_lines = parent.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == 'c':
+            parts.extend(parent_lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return ''.join(parts)
+
+
+def _encode_snapshot(content):
+    return zlib.compress(content.encode('utf-8'))
+
+
+def _encode_delta(ops):
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode(revision):
+    raw = zlib.decompress(revision.data).decode('utf-8')
+    return raw if revision.is_snapshot else json.loads(raw)
+
+
+def latest_revision_number(session, paste_id):
+    """Number of the newest stored revision, 0 when the paste was never edited"""
+    return session.query(func.max(PasteRevision.number)).filter(
+        PasteRevision.paste_id == paste_id
+    ).scalar() or 0
+
+
+def add_revision(session, paste, new_content, username):
+    """
+    Record new_content as the next revision of paste and make it current.
+
+    The original content becomes revision 1 on the first edit. The caller
+    commits; a concurrent edit fails on the (paste_id, number) constraint.
+    """
+    latest = latest_revision_number(session, paste.id)
+    parent = paste.content
+
+    if latest == 0:
+        session.add(PasteRevision(
+            paste_id=paste.id,
+            number=1,
+            is_snapshot=True,
+            data=_encode_snapshot(parent),
+            size=len(parent),
+            content_hash=content_hash(parent),
+            created_at=paste.created_date,
+            created_by=paste.created_by
+        ))
+        latest = 1
+
+    number = latest + 1
+    is_snapshot = (number - 1) % SNAPSHOT_INTERVAL == 0
+    data = None
+    if not is_snapshot:
+        data = _encode_delta(make_delta(parent, new_content))
+        # A delta that saves little is not worth the reconstruction cost
+        if len(data) * 2 > len(new_content):
+            is_snapshot = True
+    if is_snapshot:
+        data = _encode_snapshot(new_content)
+
+    session.add(PasteRevision(
+        paste_id=paste.id,
+        number=number,
+        is_snapshot=is_snapshot,
+        data=data,
+        size=len(new_content),
+        content_hash=content_hash(new_content),
+        created_by=username
+    ))
+    paste.content = new_content
+    paste.revision = number
+    paste.edited_at = datetime.utcnow()
+    return number
+
+
+def revision_content(session, paste, number):
+    """Content of revision number, or None if it does not exist"""
+    latest = latest_revision_number(session, paste.id)
+    if number == max(latest, 1):
+        # Fast path: the newest revision is the paste itself
+        return paste.content
+    if number < 1 or number > latest:
+        return None
+
+    base = session.query(PasteRevision).filter(
+        PasteRevision.paste_id == paste.id,
+        PasteRevision.number <= number,
+        PasteRevision.is_snapshot == True
+    ).order_by(desc(PasteRevision.number)).first()
+    deltas = session.query(PasteRevision).filter(
+        PasteRevision.paste_id == paste.id,
+        PasteRevision.number > base.number,
+        PasteRevision.number <= number
+    ).order_by(PasteRevision.number).all()
+
+    content = _decode(base)
+    for revision in deltas:
+        content = apply_delta(content, _decode(revision))
+
+    target = deltas[-1] if deltas else base
+    if content_hash(content) != target.content_hash:
+        raise ValueError(f'Revision {number} of paste {paste.id} failed its integrity check')
+    return content
+
+
+def list_revisions(session, paste_id):
+    """Revision metadata, newest first"""
+    return session.query(
+        PasteRevision.number,
+        PasteRevision.created_at,
+        PasteRevision.created_by,
+        PasteRevision.size
+    ).filter(PasteRevision.paste_id == paste_id).order_by(desc(PasteRevision.number)).all()
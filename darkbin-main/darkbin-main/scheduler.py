@@ -0,0 +1,195 @@
+"""
+Background jobs: moderation and premium expirations, chat archival
+
+Every worker process runs a Scheduler, but a job only runs in the worker
+that wins its lease row in scheduler_leases: the lease is taken with a
+single conditional UPDATE and lasts one interval, so each job runs about
+once per interval across the whole deployment. Jobs are set-based UPDATEs
+on indexed expiry columns, applied in bounded batches that each commit in
+their own transaction, so write locks stay short and a failure part way
+keeps the batches already done; archive_chat (see chat_archive.py) moves old chat messages out in
+batches the same way.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import get_engine
+from leaderboard import LEADERBOARD
+from models import SchedulerLease, User
+from profiles import invalidate_profile
+from chat_archive import archive_expired_chat, CHAT_ARCHIVE_INTERVAL
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'True') == 'True'
+SCHEDULER_INTERVAL = int(os.getenv('SCHEDULER_INTERVAL', 60))
+SCHEDULER_BATCH_SIZE = int(os.getenv('SCHEDULER_BATCH_SIZE', 500))
+
+
+class Job:
+    """A named function run at most once per interval across all workers"""
+
+    def __init__(self, name, func, interval=SCHEDULER_INTERVAL):
+        self.name = name
+        self.func = func
+        self.interval = interval
+
+
+def acquire_lease(name, holder, interval, now=None):
+    """Take the lease for a job if it is free or expired; True if we got it"""
+    now = now or datetime.utcnow()
+    leases = SchedulerLease.__table__
+    with get_engine().begin() as conn:
+        taken = conn.execute(
+            update(leases)
+            .where(leases.c.name == name, leases.c.expires_at <= now)
+            .values(holder=holder, acquired_at=now, expires_at=now + timedelta(seconds=interval))
+        ).rowcount
+    if taken:
+        return True
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(leases.insert().values(
+                name=name, holder=holder, acquired_at=now,
+                expires_at=now + timedelta(seconds=interval)
+            ))
+        return True
+    except IntegrityError:
+        # Another worker holds an unexpired lease
+        return False
+
+
+def release_lease(name, holder):
+    """Give up a lease early (only if holder still has it)"""
+    leases = SchedulerLease.__table__
+    with get_engine().begin() as conn:
+        conn.execute(
+            update(leases)
+            .where(leases.c.name == name, leases.c.holder == holder)
+            .values(expires_at=datetime.utcnow())
+        )
+
+
+def batched_update(engine, where, values, batch_size=SCHEDULER_BATCH_SIZE):
+    """UPDATE users matching where, one transaction per batch; returns the affected usernames"""
+    users = User.__table__
+    changed = []
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(select(users.c.id).where(*where).limit(batch_size)).scalars().all()
+            if not ids:
+                return changed
+            # where again: a row changed since the SELECT (a new ban, a renewal) is left alone
+            changed.extend(conn.execute(
+                update(users).where(users.c.id.in_(ids), *where).values(**values)
+                .returning(users.c.username)
+            ).scalars().all())
+        if len(ids) < batch_size:
+            return changed
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+def lift_expired_bans(engine, now):
+    """Unban users whose temporary ban has run out, and put them back on the leaderboard"""
+    users = User.__table__
+    unbanned = batched_update(
+        engine,
+        (users.c.banned_until <= now, users.c.is_banned == True),
+        {'is_banned': False, 'banned_until': None}
+    )
+    with engine.connect() as conn:
+        for start in range(0, len(unbanned), SCHEDULER_BATCH_SIZE):
+            rows = conn.execute(
+                select(users.c.username, users.c.reputation_points)
+                .where(users.c.username.in_(unbanned[start:start + SCHEDULER_BATCH_SIZE]), users.c.is_banned == False)
+            ).all()
+            for row in rows:
+                LEADERBOARD.add(row.username, row.reputation_points or 0)
+    return unbanned
+
+
+def lift_expired_suspensions(engine, now):
+    """Unsuspend users whose suspension has run out"""
+    users = User.__table__
+    return batched_update(
+        engine,
+        (users.c.suspended_until <= now, users.c.is_suspended == True),
+        {'is_suspended': False, 'suspended_until': None}
+    )
+
+
+def expire_premium(engine, now):
+    """Downgrade premium users whose subscription period has lapsed"""
+    users = User.__table__
+    return batched_update(
+        engine,
+        (users.c.premium_expires_at <= now, users.c.tier == 'premium'),
+        {'tier': 'free', 'tier_status': 'canceled'}
+    )
+
+
+JOBS = [
+    Job('lift_expired_bans', lift_expired_bans),
+    Job('lift_expired_suspensions', lift_expired_suspensions),
+    Job('expire_premium', expire_premium),
+    Job('archive_chat', archive_expired_chat, interval=CHAT_ARCHIVE_INTERVAL),
+]
+
+
+def run_job(job, now=None):
+    """Run one job (it opens its own transactions); returns the affected usernames"""
+    now = now or datetime.utcnow()
+    changed = job.func(get_engine(), now)
+    invalidate_profile(*changed)
+    if changed:
+        print(f"⏰ {job.name}: updated {len(changed)} users")
+    return changed
+
+
+class Scheduler:
+    """Runs due jobs from a background task in this worker"""
+
+    def __init__(self, jobs=JOBS, holder=None):
+        self.jobs = jobs
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}'
+        self._next_run = {job.name: 0 for job in jobs}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def run_pending(self):
+        """Run every job that is due here and whose lease we win"""
+        for job in self.jobs:
+            if time.monotonic() < self._next_run[job.name]:
+                continue
+            self._next_run[job.name] = time.monotonic() + job.interval
+            try:
+                if acquire_lease(job.name, self.holder, job.interval):
+                    run_job(job)
+            except Exception as e:
+                print(f"❌ Scheduled job {job.name} failed: {e}")
+
+    def run_forever(self, sleep=time.sleep):
+        tick = max(1, min(job.interval for job in self.jobs) // 2)
+        while True:
+            self.run_pending()
+            sleep(tick)
+
+    def start(self, start_background_task=None, sleep=time.sleep):
+        """Start the loop once per process (start_background_task defaults to a daemon thread)"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started or not self.jobs:
+                return
+            self._started = True
+        if start_background_task is None:
+            threading.Thread(target=self.run_forever, name='scheduler', daemon=True).start()
+        else:
+            start_background_task(self.run_forever, sleep)
@@ -0,0 +1,262 @@
+"""
+Duplicate and spam paste filter
+
+Every paste gets a paste_fingerprints row: the first 64 bits of its SHA-256
+and a 64-bit SimHash of its word 3-shingles. Each worker keeps the recent
+fingerprints in memory, loads them on first use and then picks up rows
+written by other workers every few seconds. Exact matches are a dict
+lookup; near matches use one table per band of SimHash bits. With
+SPAM_SIMHASH_DISTANCE + 1 bands, two SimHashes within that distance agree
+exactly on at least one band, so only same-band candidates are compared.
+New pastes (form and batch API) are screened here before anything is
+written to the database.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import Paste, PasteFingerprint
+
+SPAM_INDEX_DAYS = int(os.getenv('SPAM_INDEX_DAYS', 3))
+SPAM_INDEX_MAX = int(os.getenv('SPAM_INDEX_MAX', 50000))  # about 0.5 KB each
+SPAM_SYNC_INTERVAL = int(os.getenv('SPAM_SYNC_INTERVAL', 5))
+SPAM_FLOOD_WINDOW = int(os.getenv('SPAM_FLOOD_WINDOW', 600))
+SPAM_FLOOD_LIMIT = int(os.getenv('SPAM_FLOOD_LIMIT', 3))
+SPAM_SIMHASH_DISTANCE = int(os.getenv('SPAM_SIMHASH_DISTANCE', 6))
+
+# Pastes with fewer shingles than this only get exact-duplicate checks
+MIN_SHINGLES = 8
+# Only the start of a large paste goes into its SimHash
+SIMHASH_MAX_CHARS = 16 * 1024
+# Rows written in another worker may commit a little out of order
+SYNC_OVERLAP = timedelta(seconds=30)
+
+BANDS = SPAM_SIMHASH_DISTANCE + 1
+BAND_EDGES = [round(band * 64 / BANDS) for band in range(BANDS + 1)]
+MASK64 = (1 << 64) - 1
+
+WORD_RE = re.compile(r'\w+')
+
+Fingerprint = namedtuple('Fingerprint', 'paste_id content_hash simhash created_by created_at')
+
+
+def _signed(value):
+    """Unsigned 64-bit value as stored in a BIGINT column"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def content_hash(content, digest=None):
+    """First 64 bits of the content's sha256 (digest: its hex sha256, if known)"""
+    digest = digest or hashlib.sha256(content.encode('utf-8')).hexdigest()
+    return int(digest[:16], 16)
+
+
+def simhash(content):
+    """64-bit SimHash of the word 3-shingles, or None for very short text"""
+    words = WORD_RE.findall(content[:SIMHASH_MAX_CHARS].lower())
+    shingles = Counter(' '.join(words[i:i + 3]) for i in range(max(0, len(words) - 2)))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+
+    # Weighted bit votes, counted a byte at a time: one tally per byte
+    # position instead of 64 additions per shingle
+    tallies = [Counter() for _ in range(8)]
+    for shingle, weight in shingles.items():
+        h = hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+        for position in range(8):
+            tallies[position][h[position]] += weight
+    total = sum(shingles.values())
+
+    value = 0
+    for position, tally in enumerate(tallies):
+        for bit in range(8):
+            ones = sum(weight for byte, weight in tally.items() if byte >> bit & 1)
+            if 2 * ones > total:
+                value |= 1 << (position * 8 + bit)
+    return value
+
+
+def fingerprint(paste_id, content, created_by, digest=None, created_at=None):
+    """Fingerprint for a paste's content"""
+    return Fingerprint(
+        paste_id, content_hash(content, digest), simhash(content),
+        created_by, created_at or datetime.utcnow()
+    )
+
+
+def _bands(value):
+    return [
+        (band, value >> BAND_EDGES[band] & ((1 << (BAND_EDGES[band + 1] - BAND_EDGES[band])) - 1))
+        for band in range(BANDS)
+    ]
+
+
+class FingerprintIndex:
+    """Recent paste fingerprints, searchable by exact hash and SimHash distance"""
+
+    def __init__(self, days=SPAM_INDEX_DAYS, max_entries=SPAM_INDEX_MAX):
+        self.window = timedelta(days=days)
+        self.max_entries = max_entries
+        self.stats = {'duplicates': 0, 'spam': 0}
+        self._entries = {}
+        self._order = deque()
+        self._exact = {}
+        self._bands = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._synced_at = 0
+        self._last_seen = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        """Index a fingerprint, replacing any earlier one for the same paste"""
+        with self._lock:
+            self._discard(entry.paste_id)
+            self._entries[entry.paste_id] = entry
+            self._order.append(entry)
+            self._exact.setdefault(entry.content_hash, []).append(entry)
+            if entry.simhash is not None:
+                for key in _bands(entry.simhash):
+                    self._bands.setdefault(key, []).append(entry)
+            if self._last_seen is None or entry.created_at > self._last_seen:
+                self._last_seen = entry.created_at
+            self._evict()
+
+    def _discard(self, paste_id):
+        entry = self._entries.pop(paste_id, None)
+        if entry is None:
+            return
+        self._remove(self._exact, entry.content_hash, entry)
+        if entry.simhash is not None:
+            for key in _bands(entry.simhash):
+                self._remove(self._bands, key, entry)
+
+    @staticmethod
+    def _remove(table, key, entry):
+        bucket = table.get(key)
+        if bucket is None:
+            return
+        bucket[:] = [other for other in bucket if other.paste_id != entry.paste_id]
+        if not bucket:
+            del table[key]
+
+    def _evict(self):
+        oldest = datetime.utcnow() - self.window
+        while self._order:
+            entry = self._order[0]
+            # Replaced entries leave their old position behind in the deque
+            if self._entries.get(entry.paste_id) is not entry:
+                self._order.popleft()
+                continue
+            if len(self._entries) <= self.max_entries and entry.created_at >= oldest:
+                break
+            self._order.popleft()
+            self._discard(entry.paste_id)
+
+    def matches(self, content_hash, simhash):
+        """(exact, near) fingerprints matching a paste's content"""
+        with self._lock:
+            exact = list(self._exact.get(content_hash, ()))
+            near = {}
+            if simhash is not None:
+                for key in _bands(simhash):
+                    for entry in self._bands.get(key, ()):
+                        if bin(entry.simhash ^ simhash).count('1') <= SPAM_SIMHASH_DISTANCE:
+                            near[entry.paste_id] = entry
+        return exact, list(near.values())
+
+    def sync(self, session, force=False):
+        """Load the recent fingerprints on first use, then the rows added since"""
+        if not force and time.monotonic() - self._synced_at < SPAM_SYNC_INTERVAL:
+            return
+        self._synced_at = time.monotonic()
+        rows = PasteFingerprint.__table__
+        query = select(rows)
+        if self._loaded and self._last_seen is not None:
+            query = query.where(rows.c.created_at >= self._last_seen - SYNC_OVERLAP).order_by(rows.c.created_at)
+        else:
+            # Newest first so the cap keeps the most recent rows
+            query = query.where(
+                rows.c.created_at >= datetime.utcnow() - self.window
+            ).order_by(rows.c.created_at.desc()).limit(self.max_entries)
+        found = session.execute(query).all()
+        if not self._loaded:
+            found.reverse()
+            self._loaded = True
+        for row in found:
+            if row.paste_id in self._entries:
+                continue
+            self.add(Fingerprint(
+                row.paste_id, row.content_hash & MASK64,
+                None if row.simhash is None else row.simhash & MASK64,
+                row.created_by, row.created_at
+            ))
+
+
+PASTE_FINGERPRINTS = FingerprintIndex()
+
+
+def screen_paste(session, entry, index=PASTE_FINGERPRINTS):
+    """
+    Decide what to do with a new paste before it is written.
+
+    Returns ('duplicate', paste_id) when its author already posted the same
+    content, ('spam', None) when SPAM_FLOOD_LIMIT pastes with the same or
+    nearly the same content went up in the last SPAM_FLOOD_WINDOW seconds,
+    else ('ok', None).
+    """
+    index.sync(session)
+    exact, near = index.matches(entry.content_hash, entry.simhash)
+
+    if entry.created_by != 'anonymous':
+        for match in exact:
+            if match.created_by == entry.created_by:
+                index.stats['duplicates'] += 1
+                return 'duplicate', match.paste_id
+
+    recent = datetime.utcnow() - timedelta(seconds=SPAM_FLOOD_WINDOW)
+    similar = {match.paste_id for match in exact + near if match.created_at >= recent}
+    if len(similar) >= SPAM_FLOOD_LIMIT:
+        index.stats['spam'] += 1
+        return 'spam', None
+    return 'ok', None
+
+
+def record_fingerprint(session, entry, replace=False):
+    """Store a paste's fingerprint (replace: overwrite an existing one); the caller commits"""
+    (session.merge if replace else session.add)(PasteFingerprint(
+        paste_id=entry.paste_id,
+        content_hash=_signed(entry.content_hash),
+        simhash=None if entry.simhash is None else _signed(entry.simhash),
+        created_by=entry.created_by,
+        created_at=entry.created_at
+    ))
+
+
+def backfill_fingerprints(session, batch_size=500, days=SPAM_INDEX_DAYS):
+    """Fingerprint recent pastes that predate the filter; returns how many"""
+    since = datetime.utcnow() - timedelta(days=days)
+    filled = 0
+    while True:
+        pastes = session.execute(
+            select(Paste.id, Paste.content, Paste.created_by, Paste.created_date)
+            .outerjoin(PasteFingerprint, PasteFingerprint.paste_id == Paste.id)
+            .where(PasteFingerprint.paste_id.is_(None), Paste.created_date >= since)
+            .limit(batch_size)
+        ).all()
+        if not pastes:
+            return filled
+        for paste in pastes:
+            record_fingerprint(session, fingerprint(
+                paste.id, paste.content, paste.created_by, created_at=paste.created_date
+            ))
+        session.commit()
+        filled += len(pastes)
@@ -5,26 +5,27 @@ This script will:
 2. Create tables if needed
 3. Create admin user if needed
 4. Start the application
+
+With --production it skips the default admin and the development server
+and hands over to gunicorn (settings in gunicorn.conf.py), which runs the
+database set-up once before forking its workers.
 """
+import argparse
 import os
 import sys
 
-def check_dependencies():
+def check_dependencies(extra=()):
     """Check if all required packages are installed"""
     print("📦 Checking dependencies...")
-    try:
-        import flask
-        import sqlalchemy
-        import flask_login
-        import flask_bcrypt
-        import flask_socketio
-        import psycopg2
-        print("✅ All dependencies installed!")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing dependency: {e}")
-        print("\n💡 Run: pip install -r requirements.txt")
-        return False
+    from importlib.util import find_spec
+    for name in ('flask', 'sqlalchemy', 'flask_login', 'flask_bcrypt', 'flask_socketio', 'psycopg2', *extra):
+        # find_spec locates the package without paying for its import
+        if find_spec(name) is None:
+            print(f"❌ Missing dependency: No module named '{name}'")
+            print("\n💡 Run: pip install -r requirements.txt")
+            return False
+    print("✅ All dependencies installed!")
+    return True
 
 
 def check_env():
@@ -58,6 +59,12 @@ def initialize_database():
         init_db()
         print("✅ Database tables created!")
         
+        # Pastes from before the spam filter need fingerprints
+        from spam_filter import backfill_fingerprints
+        filled = backfill_fingerprints(db_session)
+        if filled:
+            print(f"🧬 Fingerprinted {filled} recent pastes")
+        
         # Check if admin exists
         admin = db_session.query(User).filter_by(username='admin').first()
         
@@ -98,21 +105,43 @@ def start_application():
     print()
     
     try:
-        from app_new import app, socketio
+        from app_new import create_app, socketio
+        app = create_app()
         socketio.run(app, host="0.0.0.0", port=5000, debug=True)
     except Exception as e:
         print(f"❌ Failed to start application: {e}")
         sys.exit(1)
 
 
+def start_production():
+    """Replace this process with gunicorn using gunicorn.conf.py"""
+    print("\n🚀 Starting skids.rest with gunicorn...")
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(here)
+    os.execv(sys.executable, [
+        sys.executable, '-m', 'gunicorn',
+        '--config', os.path.join(here, 'gunicorn.conf.py'),
+        'app_new:create_app()'
+    ])
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Start skids.rest')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with gunicorn instead of the development server')
+    return parser.parse_args(argv)
+
+
 def main():
     """Main startup sequence"""
+    args = parse_args()
     print("=" * 60)
     print("🎯 skids.rest - Quick Start")
     print("=" * 60)
     
     # Step 1: Check dependencies
-    if not check_dependencies():
+    if not check_dependencies(('gunicorn',) if args.production else ()):
         sys.exit(1)
     
     # Step 2: Check environment
@@ -120,6 +149,10 @@ def main():
         print("\n⚠️  Please configure your .env file and run this script again.")
         sys.exit(1)
     
+    if args.production:
+        # Tables and migrations are handled by gunicorn's master before fork
+        start_production()
+    
     # Step 3: Initialize database
     if not initialize_database():
         sys.exit(1)
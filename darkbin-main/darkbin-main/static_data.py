@@ -0,0 +1,79 @@
+"""
+Cached loader for the small data files served as pages (data/hol.json, data/tos)
+"""
+import json
+import os
+import threading
+
+
+class StaticDataFile:
+    """
+    Parsed contents of a data file, re-read only when its mtime or size changes.
+
+    A rendered page can be cached alongside the parsed value; it is dropped
+    whenever the file changes. A file that is missing or fails to parse
+    yields the default value and is reported once per version of the file
+    (a missing file is not reported when required is False).
+    """
+
+    def __init__(self, path, parse, default=None, required=True):
+        self.path = path
+        self.parse = parse
+        self.default = default
+        self.required = required
+        self._lock = threading.Lock()
+        self._signature = object()
+        self._value = default
+        self._rendered = None
+
+    def _stat_signature(self):
+        try:
+            stats = os.stat(self.path)
+        except OSError:
+            return None
+        return (stats.st_mtime_ns, stats.st_size)
+
+    def load(self):
+        """Current parsed value"""
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return self._value
+
+        with self._lock:
+            if signature == self._signature:
+                return self._value
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    value = self.parse(file)
+            except FileNotFoundError as e:
+                if self.required:
+                    print(f"Error loading {self.path}: {e}")
+                value = self.default
+            except Exception as e:
+                print(f"Error loading {self.path}: {e}")
+                value = self.default
+            self._value = value
+            self._rendered = None
+            self._signature = signature
+            return value
+
+    def render(self, render_page):
+        """Rendered page for the current value, built once per file version"""
+        value = self.load()
+        rendered = self._rendered
+        if rendered is not None and rendered[0] is value:
+            return rendered[1]
+        page = render_page(value)
+        self._rendered = (value, page)
+        return page
+
+
+def parse_text(file):
+    """Whole file as text"""
+    return file.read()
+
+
+def parse_hol(file):
+    """Entries of the Hall of Loosers list"""
+    data = json.load(file)
+    return [looser for looser in data.get("loosers", []) if isinstance(looser, dict)]
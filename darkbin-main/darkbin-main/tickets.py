@@ -0,0 +1,62 @@
+"""
+Support desk: the staff ticket queue and append-only ticket notes
+
+The queue is filtered by status, priority and assignee and walked oldest
+first with keyset cursors on (created_at, id), so each page is an index
+range scan no matter how many tickets precede it.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import defer
+
+from models import SupportTicket, TicketNote
+from profiles import encode_cursor, decode_cursor
+
+TICKET_STATUSES = ('open', 'pending', 'closed')
+TICKET_PRIORITIES = ('normal', 'urgent')
+
+QUEUE_PAGE_SIZE = 50
+
+
+def ticket_queue(session, status='open', priority=None, assigned_to=None, after=None, limit=QUEUE_PAGE_SIZE):
+    """
+    One page of the staff queue, oldest first, and the cursor for the next page.
+
+    status=None lists every status. Raises ValueError for a malformed cursor.
+    """
+    query = session.query(SupportTicket).options(defer(SupportTicket.message))
+    if status:
+        query = query.filter(SupportTicket.status == status)
+    if priority:
+        query = query.filter(SupportTicket.priority == priority)
+    if assigned_to:
+        query = query.filter(SupportTicket.assigned_to == assigned_to)
+    if after:
+        created_at, ticket_id = decode_cursor(after)
+        query = query.filter(or_(
+            SupportTicket.created_at > created_at,
+            and_(SupportTicket.created_at == created_at, SupportTicket.id > ticket_id)
+        ))
+
+    tickets = query.order_by(SupportTicket.created_at, SupportTicket.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(tickets) > limit:
+        tickets = tickets[:limit]
+        next_cursor = encode_cursor(tickets[-1].created_at, tickets[-1].id)
+    return tickets, next_cursor
+
+
+def ticket_notes(session, ticket_id):
+    """Notes on a ticket, oldest first"""
+    return session.query(TicketNote).filter(
+        TicketNote.ticket_id == ticket_id
+    ).order_by(TicketNote.created_at).all()
+
+
+def add_note(session, ticket, author, content):
+    """Append a staff note; the caller commits"""
+    note = TicketNote(ticket_id=ticket.id, author=author, content=content)
+    session.add(note)
+    ticket.updated_at = datetime.utcnow()
+    return note